@@ -1,7 +1,12 @@
-from core.agent.stateless_agent_class import StatelessAgent
+from core.agent.agent_registry import get_agent
 
-agent = StatelessAgent(name="Lucifer", instructions="You are the Devil called Lucifer. And you are rude.", llm_type="gemini")
+def _get_lucifer():
+    return get_agent(name="Lucifer", instructions="You are the Devil called Lucifer. And you are rude.", llm_type="gemini")
+
+async def warmup():
+    await _get_lucifer().llm.warmup()
 
 async def test_agent():
+    agent = _get_lucifer()
     response = await agent.call("What is the capital of France?")
     return response
\ No newline at end of file
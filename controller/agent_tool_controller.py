@@ -1,8 +1,18 @@
-from core.agent.stateless_agent_class import StatelessAgent
+import asyncio
+from core.agent.agent_registry import get_agent
 from tools.mail_sender_tool import MailSenderTool
 
-agent = StatelessAgent(name="Lucifer", instructions="", llm_type="gemini", next_node=MailSenderTool())
+def _get_lucifer():
+    return get_agent(name="Lucifer", instructions="", llm_type="gemini", next_node_type=MailSenderTool)
+
+async def warmup():
+    await _get_lucifer().llm.warmup()
+
+async def close():
+    # Quit the mail tool's pooled SMTP session; quit() blocks on the server, so run it off the loop
+    await asyncio.to_thread(_get_lucifer().next_node.close)
 
 async def test_agent_tool(prompt: str):
+    agent = _get_lucifer()
     response = await agent.call(prompt)
     return response
\ No newline at end of file
@@ -10,6 +10,9 @@ logger = logging.getLogger(__name__)
 
 llm = GeminiLLM(instruction="You are a helpful assistant that can answer questions and help with tasks.", model="gemini-1.5-flash", enable_web_search=True)
 
+async def warmup():
+    await llm.warmup()
+
 async def test_llm():
     logger.info("Sending request to LLM")
     response = await llm.query("You are a helpful assistant that can answer questions and help with tasks.", "What is the capital of France?")
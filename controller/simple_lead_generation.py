@@ -1,10 +1,18 @@
 from workflows.lead_generation_workflow import LeadGenerationWorkflow
+from typing import List, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def generate_leads_controller(prompt: str):
+async def warmup():
+    for node in LeadGenerationWorkflow.get_nodes():
+        await node.llm.warmup()
+
+async def generate_leads_controller(prompt: Union[str, List[str]]):
     logger.info(f"Generating leads with prompt: {prompt}")
-    response = await LeadGenerationWorkflow.run(prompt)
+    if isinstance(prompt, list):
+        response = await LeadGenerationWorkflow.run_batch(prompt)
+    else:
+        response = await LeadGenerationWorkflow.run(prompt)
     logger.info(f"Generated leads: {response}")
     return response
\ No newline at end of file
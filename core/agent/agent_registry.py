@@ -0,0 +1,38 @@
+from functools import lru_cache
+from typing import Optional, Tuple
+import logging
+from .stateless_agent_class import StatelessAgent
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=128)
+def get_agent(name: str, instructions: str, llm_type: str, enable_web_search: bool = False, next_node_type: Optional[type] = None, process_as_array: bool = False, include_fields: Optional[Tuple[str, ...]] = None) -> StatelessAgent:
+    """
+    Get a shared StatelessAgent for the given configuration, building it on first use.
+    
+    Agents are stateless, so one instance per configuration can safely serve every
+    request instead of re-initializing the LLM and tool schema each time.
+    
+    Args:
+        name (str): The name of the agent
+        instructions (str): The instructions that define how the agent should behave
+        llm_type (str): The type of LLM to use (e.g., 'gemini')
+        enable_web_search (bool): Whether to enable web search functionality
+        next_node_type (Optional[type]): Tool class to instantiate as the next node, if any
+        process_as_array (bool): Whether to process input as array
+        include_fields (Optional[Tuple[str, ...]]): Field names to include in readable output
+        
+    Returns:
+        StatelessAgent: The cached agent instance
+    """
+    logger.info(f"Creating cached agent {name} with LLM type: {llm_type}")
+    return StatelessAgent(
+        name=name,
+        instructions=instructions,
+        llm_type=llm_type,
+        next_node=next_node_type() if next_node_type is not None else None,
+        enable_web_search=enable_web_search,
+        process_as_array=process_as_array,
+        include_fields=list(include_fields) if include_fields is not None else None
+    )
@@ -1,12 +1,33 @@
+import asyncio
+import functools
+import io
+from concurrent.futures import ThreadPoolExecutor
 from core.llm.perplexity_llm import PerplexityLLM
 from ..llm.gemini_llm import GeminiLLM
 from ..llm.base_llm import BaseLLM
+from ..llm.stream_parser import InvalidArrayItem, JSONArrayItemParser
 import logging
-from typing import Any
+import re
+import orjson
+from typing import Any, Iterator, List, Optional
 from ..tool.tool_class import Tool
 
 logger = logging.getLogger(__name__)
 
+_PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+_INDENTS = tuple("  " * level for level in range(32))
+# List item index in a field path, e.g. the "[1]" in "Input[1].company_name"
+_LIST_INDEX_RE = re.compile(r"\[\d+\]")
+
+
+def _format_leaf(value: Any) -> str:
+    """Format a non-primitive leaf value as JSON when possible, falling back to str()."""
+    try:
+        return orjson.dumps(value).decode()
+    except TypeError:
+        return str(value)
+
+
 class StatelessAgent:
     """
     A simple stateless agent that processes requests without tracking history.
@@ -15,7 +36,10 @@ class StatelessAgent:
     processing individual requests based on provided instructions.
     """
     
-    def __init__(self, name: str, instructions: str, llm_type: str, next_node: Any = None, enable_web_search: bool = False, process_as_array: bool = False, include_fields: list = None):
+    # Shared pool for running sync tools without blocking the event loop
+    _executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="agent-tool")
+    
+    def __init__(self, name: str, instructions: str, llm_type: str, next_node: Any = None, enable_web_search: bool = False, process_as_array: bool = False, include_fields: list = None, use_cache: bool = True, enable_context_cache: bool = False, timeout_s: Optional[float] = None):
         """
         Initialize the stateless agent with instructions and LLM type.
         
@@ -27,26 +51,42 @@ class StatelessAgent:
             enable_web_search (bool): Whether to enable web search functionality
             process_as_array (bool): Whether to process input as array
             include_fields (list, optional): List of specific field names to include in readable output. If None, includes all fields.
+            use_cache (bool): Whether to serve repeated prompts from the shared LLM response cache.
+                Always disabled when web search is enabled, since those results are time-sensitive.
+            enable_context_cache (bool): Whether to upload the instructions and tool schema once via
+                the LLM's context caching API. Only supported by Gemini; ignored otherwise.
+            timeout_s (Optional[float]): Maximum seconds each LLM request may take, on top of the HTTP timeout.
+                Tool runs are never cut off, since they may have side effects. None disables the limit.
         """
         self.name = name
         self.instructions = f"You are {name}. {instructions}"
         self.llm_type = llm_type
-        self.llm = self._initialize_llm(enable_web_search)
+        self.llm = self._initialize_llm(enable_web_search, enable_context_cache)
         self.next_node = next_node
         self.process_as_array = process_as_array
         self.include_fields = include_fields
+        # include_fields compiled once so every field check is O(1)
+        include_fields = include_fields or ()
+        self._include_exact = frozenset(include_fields)
+        self._include_bare = frozenset(field for field in include_fields if "." not in field)
+        # Every dotted parent path of an included field, e.g. "a" and "a.b" for "a.b.c"
+        self._include_parents = frozenset(
+            field[:index] for field in include_fields for index, char in enumerate(field) if char == "."
+        )
+        self.use_cache = use_cache and not enable_web_search
+        self.timeout_s = timeout_s
         
         if self.next_node is not None:
-            tool_schema = self.next_node._generate_dynamic_schema_prompt()
+            tool_schema = self.next_node.cached_schema_prompt()
             self.instructions = f"{self.instructions}\n\n{tool_schema}"
             self.is_in_workflow = True
             self.next_node_name = self.next_node.name if self.next_node else 'Tool'
         else:
             self.is_in_workflow = False
 
-        logger.info(f"Stateless Agent {self.name} initialized with LLM type: {self.llm_type}")
+        logger.info("Stateless Agent %s initialized with LLM type: %s", self.name, self.llm_type)
     
-    def _initialize_llm(self, enable_web_search: bool = False) -> BaseLLM:
+    def _initialize_llm(self, enable_web_search: bool = False, enable_context_cache: bool = False) -> BaseLLM:
         """
         Initialize the appropriate LLM based on the llm_type.
         
@@ -54,82 +94,332 @@ class StatelessAgent:
             BaseLLM: The initialized LLM instance
         """
         if self.llm_type.lower() == "gemini":
-            return GeminiLLM(self.instructions, "gemini-2.5-flash", enable_web_search=enable_web_search)
+            return GeminiLLM(self.instructions, "gemini-2.5-flash", enable_web_search=enable_web_search, enable_context_cache=enable_context_cache)
         elif self.llm_type.lower() == "perplexity":
             return PerplexityLLM(self.instructions, "sonar-pro", enable_web_search=enable_web_search)
         else:
             raise ValueError(f"Unsupported LLM type: {self.llm_type}")
     
-    def _convert_json_to_readable_string(self, data: Any, indent_level: int = 0, current_path: str = "") -> str:
+    def _should_include_field(self, key: str, field_path: str) -> bool:
         """
-        Convert JSON data (dict, list, or nested structures) to a readable string format.
-        Only includes fields specified in self.include_fields if provided.
+        Check whether a field passes the include_fields filter.
+        
+        A field is included when its key or path is listed, or when it is a parent
+        of a listed path. Dotted entries also match inside list items, so
+        'Input.company_name' matches 'Input[1].company_name' but not a
+        company_name anywhere else.
         
         Args:
-            data: Input data that can be a dict, list, or other types
-            indent_level: Current indentation level for nested structures
-            current_path: Current path in the data structure for field filtering
+            key: The field name
+            field_path: The full path of the field in the data structure
             
         Returns:
-            str: Readable string format of the data
+            bool: Whether the field should be included
+        """
+        if key in self._include_bare or field_path in self._include_exact or field_path in self._include_parents:
+            return True
+        if "[" not in field_path:
+            return False
+        list_path = _LIST_INDEX_RE.sub("", field_path)
+        return list_path in self._include_exact or list_path in self._include_parents
+
+    def _readable_string_pieces(self, data: Any, indent_level: int, current_path: str) -> Iterator[Any]:
         """
-        indent = "  " * indent_level
+        Yield the pieces of the readable string for one level of the data.
+        
+        Strings are written as-is; (data, indent_level, current_path) tuples are
+        nested structures to be expanded in place by _convert_json_to_readable_string.
+        """
+        indent = _INDENTS[indent_level] if indent_level < len(_INDENTS) else "  " * indent_level
         
         if isinstance(data, dict):
-            # Convert dictionary to readable format with proper indentation
-            readable_lines = []
+            filter_fields = self.include_fields is not None
+            is_first = True
             for key, value in data.items():
                 # Build current field path for filtering
                 field_path = f"{current_path}.{key}" if current_path else key
                 
-                # Filter fields if include_fields is specified
-                if self.include_fields is not None:
-                    # Check if this field or any of its subfields should be included
-                    should_include = any(
-                        field == field_path or field.startswith(field_path + ".") or
-                        # Also check if this field is directly in the include_fields list (for nested fields)
-                        key in self.include_fields
-                        for field in self.include_fields
-                    )
-                    if not should_include:
-                        continue
-                    
-                if isinstance(value, (str, int, float, bool, type(None))):
-                    readable_lines.append(f"{indent}{key}: {value}")
+                if filter_fields and not self._should_include_field(key, field_path):
+                    continue
+                
+                if not is_first:
+                    yield "\n"
+                is_first = False
+                
+                if isinstance(value, _PRIMITIVE_TYPES):
+                    yield f"{indent}{key}: {value}"
                 elif isinstance(value, list):
                     if not value:  # Empty list
-                        readable_lines.append(f"{indent}{key}: []")
-                    elif all(isinstance(item, (str, int, float, bool, type(None))) for item in value):
+                        yield f"{indent}{key}: []"
+                    elif all(isinstance(item, _PRIMITIVE_TYPES) for item in value):
                         # List of primitive values
-                        readable_lines.append(f"{indent}{key}: {', '.join(map(str, value))}")
+                        yield f"{indent}{key}: {', '.join(map(str, value))}"
                     else:
                         # List of complex objects
-                        readable_lines.append(f"{indent}{key}:")
+                        yield f"{indent}{key}:"
                         for i, item in enumerate(value, 1):
-                            readable_lines.append(f"{indent}  [{i}]: {self._convert_json_to_readable_string(item, indent_level + 2, field_path + f'[{i}]')}")
+                            yield f"\n{indent}  [{i}]: "
+                            yield (item, indent_level + 2, f"{field_path}[{i}]")
                 elif isinstance(value, dict):
-                    readable_lines.append(f"{indent}{key}:")
-                    readable_lines.append(self._convert_json_to_readable_string(value, indent_level + 1, field_path))
+                    yield f"{indent}{key}:\n"
+                    yield (value, indent_level + 1, field_path)
                 else:
-                    readable_lines.append(f"{indent}{key}: {str(value)}")
-            return '\n'.join(readable_lines)
+                    yield f"{indent}{key}: {_format_leaf(value)}"
         
         elif isinstance(data, list):
             if not data:  # Empty list
-                return "[]"
-            elif all(isinstance(item, (str, int, float, bool, type(None))) for item in data):
+                yield "[]"
+            elif all(isinstance(item, _PRIMITIVE_TYPES) for item in data):
                 # List of primitive values
-                return f"[{', '.join(map(str, data))}]"
+                yield f"[{', '.join(map(str, data))}]"
             else:
                 # List of complex objects
-                readable_sections = []
                 for i, item in enumerate(data, 1):
-                    readable_sections.append(f"{indent}[{i}]: {self._convert_json_to_readable_string(item, indent_level + 1, current_path + f'[{i}]')}")
-                return '\n'.join(readable_sections)
+                    if i > 1:
+                        yield "\n"
+                    yield f"{indent}[{i}]: "
+                    yield (item, indent_level + 1, f"{current_path}[{i}]")
         
-        else:
+        elif isinstance(data, _PRIMITIVE_TYPES):
             # Return as-is if not a dict or list
-            return str(data)
+            yield str(data)
+        
+        else:
+            yield _format_leaf(data)
+
+    def _convert_json_to_readable_string(self, data: Any, indent_level: int = 0, current_path: str = "") -> str:
+        """
+        Convert JSON data (dict, list, or nested structures) to a readable string format.
+        Only includes fields specified in self.include_fields if provided.
+        
+        Nested structures are walked with an explicit stack and written into a
+        single buffer, so deep or large inputs do not build intermediate strings
+        at every level.
+        
+        Args:
+            data: Input data that can be a dict, list, or other types
+            indent_level: Current indentation level for nested structures
+            current_path: Current path in the data structure for field filtering
+            
+        Returns:
+            str: Readable string format of the data
+        """
+        buffer = io.StringIO()
+        write = buffer.write
+        stack = [self._readable_string_pieces(data, indent_level, current_path)]
+        
+        while stack:
+            for piece in stack[-1]:
+                if isinstance(piece, str):
+                    write(piece)
+                else:
+                    stack.append(self._readable_string_pieces(*piece))
+                    break
+            else:
+                stack.pop()
+        
+        return buffer.getvalue()
+
+    async def _query_llm(self, message: Any, use_cache: bool = True, store: bool = True) -> Any:
+        """
+        Query the LLM within timeout_s, serving the response from the shared cache when possible.
+        
+        Args:
+            message: The processed message to send to the LLM
+            use_cache (bool): Whether the cache may be used. Retries pass False so a failed
+                response is never replayed.
+            store (bool): Whether to cache a fresh response right away. Pass False when the
+                next node still has to accept it, and call _cache_response once it has.
+            
+        Returns:
+            The LLM response
+        """
+        async with asyncio.timeout(self.timeout_s):
+            if not (use_cache and self.use_cache):
+                return await self.llm.query(self.instructions, message)
+            return await self.llm.cached_query(self.instructions, message, store=store)
+
+    async def _get_cached_response(self, message: Any) -> Any:
+        """
+        Look up an accepted response in the shared cache without querying the LLM.
+        
+        Args:
+            message: The processed message to look up
+            
+        Returns:
+            The cached LLM response, or None on a miss or when the cache is disabled
+        """
+        if not self.use_cache:
+            return None
+        async with asyncio.timeout(self.timeout_s):
+            return await self.llm.get_cached_response(self.instructions, message)
+
+    async def _cache_response(self, message: Any, response: Any) -> None:
+        """
+        Cache an LLM response after the next node accepted it.
+        
+        Args:
+            message: The processed message the response was generated for
+            response: The LLM response
+        """
+        if self.use_cache:
+            await self.llm.cache_response(self.instructions, message, response)
+
+    async def _run_tool(self, input_data: Any) -> Any:
+        """
+        Run the next node in the shared thread pool so tool I/O does not block the event loop.
+        
+        Args:
+            input_data: The input data for the tool
+            
+        Returns:
+            The tool response
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self.next_node.run, input_data))
+
+    @staticmethod
+    def _is_tool_success(tool_response: Any) -> bool:
+        """Check whether a tool response reports success."""
+        return isinstance(tool_response, dict) and tool_response.get("success", True) is not False
+
+    @staticmethod
+    def _is_retryable_tool_failure(tool_response: Any) -> bool:
+        """Check whether a tool response failed because of the LLM generated input."""
+        if not isinstance(tool_response, dict):
+            return True
+        return tool_response.get("success", True) is False and tool_response.get("server_error", False) is False
+
+    async def _run_tool_on_items(self, processed_message: Any, items: list, llm_response: Any) -> dict:
+        """
+        Run the next node on every item of an array response concurrently.
+        
+        Items whose tool call fails are retried together with a single batched
+        LLM call carrying all of their errors, instead of one retry per item.
+        The LLM response is cached only when every item is accepted.
+        
+        Args:
+            processed_message: The processed user message
+            items (list): The items generated by the LLM
+            llm_response: The full LLM response the items came from
+            
+        Returns:
+            dict: The agent result with one tool response per item
+        """
+        results = await asyncio.gather(*[self._run_tool(item) for item in items])
+        if all(self._is_tool_success(result) for result in results):
+            await self._cache_response(processed_message, llm_response)
+        return await self._retry_failed_items(processed_message, list(items), list(results))
+
+    async def _retry_failed_items(self, processed_message: Any, items: list, results: list) -> dict:
+        """
+        Retry the items whose tool call failed with one batched LLM call per round.
+        
+        Args:
+            processed_message: The processed user message
+            items (list): The items generated by the LLM
+            results (list): The tool response for each item
+            
+        Returns:
+            dict: The agent result with one tool response per item
+        """
+        while True:
+            failed = [index for index, result in enumerate(results) if self._is_retryable_tool_failure(result)]
+            if not failed:
+                break
+            
+            logger.info("%s %s of %s tool calls failed, retrying them in one batch", self.name, len(failed), len(items))
+            errors = "\n".join(f"[{position}] {items[index]} got error: {results[index]}" for position, index in enumerate(failed))
+            response = await self._query_llm(f"User instructions: {processed_message} \n\nThese items generated by LLM in last cycle got errors:\n{errors}\n\nNow generate a JSON array with exactly one corrected item for each of these {len(failed)} items, in the same order, without these errors or new errors..", use_cache=False)
+            
+            if isinstance(response, dict) and response.get("status") == "success":
+                if response.get("format") == "wrapped":
+                    return {
+                        "success": False,
+                        "error": f"{self.name} says tool call failed, generated response: {response.get('response')}"
+                    }
+                response = response.get("response")
+            
+            if not isinstance(response, list) or len(response) != len(failed):
+                return {
+                    "success": False,
+                    "error": f"{self.name} says tool call failed, expected {len(failed)} corrected items but got: {response}"
+                }
+            
+            retried = await asyncio.gather(*[self._run_tool(item) for item in response])
+            for index, item, result in zip(failed, response, retried):
+                items[index] = item
+                results[index] = result
+        
+        return {
+            "success": True,
+            "data": [result.get("response", {}) if isinstance(result, dict) else result for result in results]
+        }
+
+    @staticmethod
+    def _invalid_item_result(item: InvalidArrayItem) -> asyncio.Future:
+        """Get a completed tool call future that reports a streamed item as invalid JSON."""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result({
+            "success": False,
+            "server_error": False,
+            "error": f"Item is not valid JSON: {item.error}"
+        })
+        return future
+
+    async def _call_streaming(self, processed_message: Any) -> tuple:
+        """
+        Stream the LLM response and start a tool call for each array item as soon as it is complete.
+        
+        Tool execution overlaps with generation, so end-to-end latency approaches
+        max(LLM, tool) instead of their sum. Items that are not valid JSON count
+        as failed tool calls and are regenerated like any other failed item.
+        The full response is cached, like in _run_tool_on_items, only when every
+        item is accepted.
+        
+        Args:
+            processed_message: The processed user message
+            
+        Returns:
+            tuple: (result, response). result is the agent result when array items
+                were streamed; otherwise it is None and response is the full LLM
+                response for the regular, non-streaming path.
+        """
+        parser = JSONArrayItemParser()
+        chunks = []
+        items = []
+        tool_calls = []
+        
+        try:
+            # Only reading the stream is bounded by timeout_s; the tool calls run to completion
+            async with asyncio.timeout(self.timeout_s):
+                async for chunk in self.llm.query_stream(self.instructions, processed_message):
+                    chunks.append(chunk)
+                    for item in parser.feed(chunk):
+                        if isinstance(item, InvalidArrayItem):
+                            # Never run the tool on it; fail it so _retry_failed_items regenerates it
+                            items.append(item.text)
+                            tool_calls.append(self._invalid_item_result(item))
+                        else:
+                            items.append(item)
+                            tool_calls.append(asyncio.ensure_future(self._run_tool(item)))
+            
+            if not items:
+                logger.info("%s streamed response had no array items, falling back to full response", self.name)
+                return None, self.llm.parse_response("".join(chunks))
+            
+            logger.info("%s streamed %s items to %s", self.name, len(items), self.next_node_name)
+            results = await asyncio.gather(*tool_calls)
+            if all(self._is_tool_success(result) for result in results):
+                await self._cache_response(processed_message, self.llm.parse_response("".join(chunks)))
+        finally:
+            # If the stream or a tool call failed, stop the tool calls that have not
+            # started yet and collect every outcome so no exception goes unobserved
+            for tool_call in tool_calls:
+                tool_call.cancel()
+            await asyncio.gather(*tool_calls, return_exceptions=True)
+        
+        return await self._retry_failed_items(processed_message, items, list(results)), None
 
     def before_call(self, input_data: Any) -> Any:
         """
@@ -163,66 +453,124 @@ class StatelessAgent:
         Returns:
             str: The agent's response to the message
         """
-        logger.info(f"{self.name} is processing message: {message}")
+        logger.info("%s is processing message: %s", self.name, message)
         
         # Process input data using before_call method
         processed_message = self.before_call(message)
 
-        print(message, 'log1')
-        print(processed_message, 'log2')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s message=%s processed=%s", self.name, message, processed_message)
 
         # Use the initialized LLM to process the message
         # Since this is stateless, we don't pass any history
         try:
             if self.is_in_workflow:
-                run_count = 0
-                run_count += 1
+                logger.info("%s is in workflow and next node is a %s", self.name, self.next_node_name)
 
-                logger.info(f"{run_count} {self.name} is in workflow and next node is a {self.next_node_name}")
+                response = None
+                if self.process_as_array and self.llm.supports_streaming:
+                    # A cached response was already accepted, so it is replayed instead of streamed
+                    response = await self._get_cached_response(processed_message)
+                    if response is None:
+                        result, response = await self._call_streaming(processed_message)
+                        if result is not None:
+                            return result
 
-                response = await self.llm.query(self.instructions, processed_message)
+                if response is None:
+                    # Cached only once the next node accepts it, so a rejected response is never replayed
+                    response = await self._query_llm(processed_message, store=False)
+                llm_response = response
 
-                print(response, 'log3')
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("%s response=%s", self.name, response)
 
                 if response.get('status') != 'success':
                     raise Exception(f"{self.name} error: {response.get('error', 'Unknown error')}")
 
                 response = response.get('response')
 
-                logger.info(f"{run_count} {self.name} generated response: {response} for {self.next_node_name}")
-                tool_response = self.next_node.run(response)
-                logger.info(f"{run_count} {self.name} tool response: {tool_response} from {self.next_node_name}")
+                logger.info("%s generated response: %s for %s", self.name, response, self.next_node_name)
+
+                if self.process_as_array and isinstance(response, list):
+                    return await self._run_tool_on_items(processed_message, response, llm_response)
+
+                tool_response = await self._run_tool(response)
+                logger.info("%s tool response: %s from %s", self.name, tool_response, self.next_node_name)
+
+                if self._is_tool_success(tool_response):
+                    await self._cache_response(processed_message, llm_response)
+
+                while True:
+                    # Stop retrying on success or on a server-side tool error
+                    if isinstance(tool_response, dict):
+                        if tool_response.get("success", True) is not False:
+                            break
+                        if tool_response.get("server_error", False) is not False:
+                            break
 
-                while type(tool_response) != dict or (tool_response.get("success", True) is False and tool_response.get("server_error", False) is False):
                     # error_msg = tool_response.get('error', 'Unknown error') if isinstance(tool_response, dict) else str(tool_response)
-                    response = await self.llm.query(self.instructions, f"User instructions: {processed_message} \n\nResponse generated by LLM in last cycle {response} got error: {tool_response}. Now generate new response without these errors or new errors..")
+                    # Retries bypass the cache so a failed response is never replayed
+                    response = await self._query_llm(f"User instructions: {processed_message} \n\nResponse generated by LLM in last cycle {response} got error: {tool_response}. Now generate new response without these errors or new errors..", use_cache=False)
 
-                    if response is None or (response is not None and isinstance(response, dict) and response.get("status") == "success" and response.get("format") == "wrapped"):
-                        logger.info(f"{run_count} {self.name} Tool call failed, generated response: {response}")
-                        response_text = response.get('response', str(response)) if isinstance(response, dict) else str(response)
+                    is_wrapped = isinstance(response, dict) and response.get("format") == "wrapped" and response.get("status") == "success"
+                    if response is None or is_wrapped:
+                        logger.info("%s Tool call failed, generated response: %s", self.name, response)
+                        response_text = response.get('response', str(response)) if is_wrapped else str(response)
                         return {
                             "success": False,
                             "error": f"{self.name} says tool call failed, generated response: {response_text}"
                         }
 
-                    tool_response = self.next_node.run(response)
+                    response = response.get('response')
+                    tool_response = await self._run_tool(response)
  
-                logger.info(f"{run_count} {self.name} generated response: {response}")
+                logger.info("%s generated response: %s", self.name, response)
                 return {
                     "success": True,
                     "data": tool_response.get("response", {}) if isinstance(tool_response, dict) else tool_response
                 }
             else:
                 # Handle case when not in workflow or next_node is not a Tool
-                response = await self.llm.query(self.instructions, processed_message)
-                logger.info(f"{self.name} generated response: {response}")
+                response = await self._query_llm(processed_message)
+                logger.info("%s generated response: %s", self.name, response)
                 return {
                     "success": True,
                     "data": response
                 }
+        except asyncio.CancelledError:
+            raise
+        except TimeoutError:
+            logger.error("%s LLM request timed out", self.name)
+            return {
+                "success": False,
+                "error": f"{self.name} LLM request timed out"
+            }
         except Exception as e:
-            logger.error(f"{self.name} error: {e}")
+            logger.error("%s error: %s", self.name, e)
             return {
                 "success": False,
                 "error": str(e)
             }
+
+    async def call_batch(self, messages: List[Any], max_concurrency: int = 8) -> List[dict]:
+        """
+        Process many messages concurrently.
+        
+        Each message goes through the same pipeline as call(), including the
+        response cache and tool retries, with at most max_concurrency in flight.
+        
+        Args:
+            messages (List[Any]): The input messages to process
+            max_concurrency (int): Maximum number of messages processed at once
+            
+        Returns:
+            List[dict]: The agent's responses, in the same order as messages
+        """
+        logger.info("%s is processing a batch of %s messages", self.name, len(messages))
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def bounded_call(message: Any) -> dict:
+            async with semaphore:
+                return await self.call(message)
+        
+        return await asyncio.gather(*[bounded_call(message) for message in messages])
@@ -1,22 +1,146 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+import asyncio
+import functools
+import logging
+import os
+import aiohttp
+from dotenv import load_dotenv
+from .cache import LLMCache, get_llm_cache
+from .http import close_session, get_session
+from .rate_limiter import AsyncTokenBucket
+
+logger = logging.getLogger(__name__)
+
+_env_loaded = False
+
+
+def load_env() -> None:
+    """Load variables from .env into the environment, once per process."""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+
+@functools.lru_cache(maxsize=None)
+def get_api_key(name: str) -> str:
+    """
+    Get an API key from the environment, resolved once per process.
+    
+    Args:
+        name (str): The environment variable holding the key
+    
+    Returns:
+        str: The API key
+    
+    Raises:
+        ValueError: If the variable is not set
+    """
+    load_env()
+    api_key = os.getenv(name)
+    if not api_key:
+        logger.error("%s environment variable is not set!", name)
+        raise ValueError(f"{name} environment variable is required")
+    return api_key
+
+
+def get_response_cache() -> LLMCache:
+    """Get the shared LLM response cache, after loading .env so its Redis URL can be set there."""
+    load_env()
+    return get_llm_cache()
+
+
+# Conversation history labels for the common roles, so they are not re-titled per message
+ROLE_LABELS = {"user": "User", "assistant": "Assistant", "system": "System"}
+
+JSON_REQUIREMENT_PROMPT = "IMPORTANT: You must ALWAYS respond with valid JSON format. No matter what the question or request is, your response must be a valid JSON object. Do not include any text outside of the JSON structure.\n\n"
 
 class BaseLLM(ABC):
     """
     Base class for all LLM implementations.
     Provides a common interface for different LLM providers.
+    
+    All instances share one process-wide aiohttp session so that TCP/TLS
+    connections are kept alive and reused across queries, and all instances
+    of the same LLM type share one rate limiter. Callers with many prompts
+    should issue them concurrently (asyncio.gather or query_batch) rather
+    than awaiting them one by one; the rate limiter keeps them within quota.
     """
     
-    def __init__(self, instruction: str, llm_type: str):
+    # Whether query_stream is implemented by this LLM
+    supports_streaming = False
+    
+    _rate_limiters: Dict[str, AsyncTokenBucket] = {}
+    
+    def __init__(self, instruction: str, llm_type: str, client: Optional[aiohttp.ClientSession] = None, qpm: int = 500):
         """
         Initialize the base LLM with instruction and type.
         
         Args:
             instruction (str): The system instruction for the LLM
             llm_type (str): The type of LLM (e.g., 'gemini', 'openai', etc.)
+            client (Optional[aiohttp.ClientSession]): Session to use for REST calls.
+                Defaults to the shared session returned by get_http_client().
+            qpm (int): Maximum queries per minute for this LLM type. The first
+                instance of a type sets the limit shared by all later instances.
         """
         self.instruction = instruction
         self.llm_type = llm_type
+        self.client = client
+        if llm_type not in BaseLLM._rate_limiters:
+            BaseLLM._rate_limiters[llm_type] = AsyncTokenBucket(rate_per_minute=qpm)
+        self._rate_limiter = BaseLLM._rate_limiters[llm_type]
+    
+    @classmethod
+    def get_http_client(cls) -> aiohttp.ClientSession:
+        """
+        Get the shared HTTP session, creating it lazily on first use.
+        Must be called from inside a running event loop.
+        
+        Returns:
+            aiohttp.ClientSession: The process-wide session with a pooled connector
+        """
+        return get_session()
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close the shared HTTP session. Call this on application shutdown."""
+        await close_session()
+    
+    def _get_warmup_request(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the request used to warm up the connection, as keyword arguments for
+        session.request(). Override in child classes with a cheap provider endpoint.
+        
+        Returns:
+            Optional[Dict[str, Any]]: The request, or None to skip warmup
+        """
+        base_url = getattr(self, "base_url", None)
+        return {"method": "HEAD", "url": base_url} if base_url else None
+    
+    async def warmup(self) -> None:
+        """
+        Open a pooled keep-alive connection to the provider ahead of the first query,
+        so the first real request does not pay for DNS, TCP and TLS setup.
+        Failures are logged and ignored since warmup is only an optimization.
+        """
+        request = self._get_warmup_request()
+        if request is None:
+            return
+        
+        try:
+            async with self._get_client().request(timeout=aiohttp.ClientTimeout(total=10), **request) as response:
+                await response.read()
+                logger.info("%s warmup completed with status %s", self.llm_type, response.status)
+        except Exception as e:
+            logger.warning("%s warmup failed: %s: %s", self.llm_type, type(e).__name__, str(e))
+    
+    def _get_client(self) -> aiohttp.ClientSession:
+        """Get the session this instance should use for REST calls."""
+        if self.client is not None and not self.client.closed:
+            return self.client
+        return self.get_http_client()
     
     def _initialize_llm(self):
         """
@@ -26,7 +150,7 @@ class BaseLLM(ABC):
         pass
     
     @abstractmethod
-    def query(self, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+    def query(self, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
         """
         Query the LLM with a prompt and optional conversation history.
         
@@ -36,10 +160,127 @@ class BaseLLM(ABC):
                 [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}]
         
         Returns:
-            str: The LLM's response
+            Dict[str, Any]: {"response": parsed JSON, "status": "success"}; when the
+                output was not JSON, "response" is the raw text and "format" is "wrapped"
         """
         pass
     
+    def parse_response(self, response_text: str) -> Dict[str, Any]:
+        """
+        Parse raw response text, such as the joined chunks of query_stream, the same way query does.
+        
+        Args:
+            response_text (str): The raw response text from the LLM
+        
+        Returns:
+            Dict[str, Any]: The response in the same format as query
+        """
+        return self._ensure_json_response(response_text)
+    
+    async def cached_query(self, instruction: str, prompt: Any, history: Optional[List[Dict[str, str]]] = None, store: bool = True) -> Any:
+        """
+        Query the LLM, serving identical or near-identical inputs from the shared response cache.
+        
+        Queries with web search enabled always go to the provider, since their
+        results are time-sensitive.
+        
+        Args:
+            instruction (str): The system instruction for the LLM
+            prompt (Any): The user's prompt/query
+            history (Optional[List[Dict[str, str]]]): Conversation history
+            store (bool): Whether to cache a fresh response. Pass False when the response
+                still has to be checked, and call cache_response once it is accepted.
+        
+        Returns:
+            Any: The LLM's response
+        """
+        response = await self.get_cached_response(instruction, prompt, history)
+        if response is not None:
+            return response
+        
+        response = await self.query(instruction, prompt, history)
+        if store:
+            await self.cache_response(instruction, prompt, response, history)
+        return response
+    
+    async def get_cached_response(self, instruction: str, prompt: Any, history: Optional[List[Dict[str, str]]] = None) -> Optional[Any]:
+        """
+        Look up a response in the shared response cache without querying the LLM.
+        Always misses when web search is enabled.
+        
+        Args:
+            instruction (str): The system instruction for the LLM
+            prompt (Any): The user's prompt/query
+            history (Optional[List[Dict[str, str]]]): Conversation history
+        
+        Returns:
+            Optional[Any]: The cached response, or None on a miss
+        """
+        if getattr(self, "enable_web_search", False):
+            return None
+        return await get_response_cache().aget(getattr(self, "model", self.llm_type), instruction, prompt, history)
+    
+    async def cache_response(self, instruction: str, prompt: Any, response: Any, history: Optional[List[Dict[str, str]]] = None) -> None:
+        """
+        Store a checked response in the shared response cache, for use with cached_query(store=False).
+        Does nothing when web search is enabled.
+        
+        Args:
+            instruction (str): The system instruction for the LLM
+            prompt (Any): The user's prompt/query
+            response (Any): The LLM's response
+            history (Optional[List[Dict[str, str]]]): Conversation history
+        """
+        if getattr(self, "enable_web_search", False) or response is None:
+            return
+        await get_response_cache().aset(getattr(self, "model", self.llm_type), instruction, prompt, response, history)
+    
+    def _get_instruction_prompt(self, instruction: str) -> str:
+        """
+        Get the system instruction and JSON format requirement prompt prefix.
+        Callers that reuse it on every query cache the result themselves.
+        
+        Args:
+            instruction (str): The system instruction
+        
+        Returns:
+            str: The formatted prompt prefix
+        """
+        return "".join(("System Instruction: ", instruction, "\n\n", JSON_REQUIREMENT_PROMPT))
+    
+    async def query_batch(self, items: List[Tuple[str, Any, Optional[List[Dict[str, str]]]]]) -> List[Any]:
+        """
+        Query the LLM with many independent prompts at once.
+        
+        Requests are issued concurrently over the shared HTTP session, so N prompts
+        take about as long as the slowest one rather than N round trips. The
+        provider's concurrency limit and rate limiter bound how many are in flight.
+        
+        Args:
+            items (List[Tuple[str, Any, Optional[List[Dict[str, str]]]]]): One
+                (instruction, prompt, history) tuple per query
+        
+        Returns:
+            List[Any]: The responses, in the same order as items
+        """
+        return await asyncio.gather(*(self.query(instruction, prompt, history) for instruction, prompt, history in items))
+    
+    async def query_stream(self, instructions: str, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+        """
+        Query the LLM and yield the raw response text as it is generated.
+        Only available when supports_streaming is True.
+        
+        Args:
+            instructions (str): The system instruction for the LLM
+            prompt (str): The user's prompt/query
+            history (Optional[List[Dict[str, str]]]): Conversation history
+        
+        Yields:
+            str: Chunks of the raw response text, in order
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+        yield
+    
     def get_instruction(self) -> str:
         """Get the current instruction."""
         return self.instruction
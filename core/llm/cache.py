@@ -0,0 +1,252 @@
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+
+class LLMCache:
+    """
+    Two-tier in-memory cache for LLM responses.
+
+    Features:
+    - Exact tier: SHA256 of (model, instructions, message, history) in an LRU with TTL
+    - Semantic tier: cosine similarity over message embeddings for near-duplicates,
+      enabled only when an embedding function is provided
+    - Optional Redis backend for the exact tier, shared across processes, used by
+      the async aget/aset methods when a Redis URL is given and redis is installed
+    
+    Responses are stored serialized with orjson and decoded on every hit, so a
+    caller mutating a returned response cannot change what later hits get.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600, embed_fn: Optional[Callable[[str], Sequence[float]]] = None, similarity_threshold: float = 0.92, redis_url: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size (int): Maximum number of cached responses
+            ttl_seconds (float): Seconds before a cached response expires
+            embed_fn (Optional[Callable[[str], Sequence[float]]]): Function that embeds a message
+                for the semantic tier. If None, only exact matches are served.
+            similarity_threshold (float): Minimum cosine similarity for a semantic hit
+            redis_url (Optional[str]): Redis URL for the shared exact tier. If None, the cache
+                is in-memory only.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        # key -> (expires_at, scope, serialized response)
+        self._entries: "OrderedDict[str, Tuple[float, str, bytes]]" = OrderedDict()
+        # key -> normalized embedding, and a stacked (N, D) matrix rebuilt lazily
+        self._embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._redis = None
+        if redis_url:
+            if redis_asyncio is None:
+                logger.warning("redis is not installed, LLM cache will be in-memory only")
+            else:
+                self._redis = redis_asyncio.from_url(redis_url)
+
+    @staticmethod
+    def _dumps(response: Any) -> bytes:
+        return orjson.dumps(response, option=orjson.OPT_NON_STR_KEYS)
+
+    @staticmethod
+    def _hash(payload: dict) -> str:
+        return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)).hexdigest()
+
+    def cache_key(self, model: str, instructions: str, message: Any, history: Optional[List[Dict[str, str]]] = None) -> str:
+        """
+        Get the exact-match cache key for a query.
+
+        Args:
+            model (str): The model name
+            instructions (str): The system instructions
+            message (Any): The user message
+            history (Optional[List[Dict[str, str]]]): Conversation history
+
+        Returns:
+            str: Hex SHA256 of the normalized inputs
+        """
+        return self._keys(model, instructions, message, history)[1]
+
+    def _keys(self, model: str, instructions: str, message: Any, history: Optional[List[Dict[str, str]]] = None) -> Tuple[str, str]:
+        """Get the (scope, key) pair for a lookup. Scope covers everything but the message."""
+        scope = self._hash({"model": model, "instructions": instructions, "history": history or []})
+        key = self._hash({"scope": scope, "message": message})
+        return scope, key
+
+    def _embed(self, message: Any) -> Optional[np.ndarray]:
+        if self.embed_fn is None:
+            return None
+        vector = np.asarray(self.embed_fn(message if isinstance(message, str) else orjson.dumps(message, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode()), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _evict(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self._embeddings.pop(key, None) is not None:
+            self._matrix = None
+
+    def get(self, model: str, instructions: str, message: Any, history: Optional[List[Dict[str, str]]] = None) -> Optional[Any]:
+        """
+        Look up a cached response in memory.
+
+        Args:
+            model (str): The model name
+            instructions (str): The system instructions
+            message (Any): The user message
+            history (Optional[List[Dict[str, str]]]): Conversation history
+
+        Returns:
+            Optional[Any]: The cached response, or None on a miss
+        """
+        scope, key = self._keys(model, instructions, message, history)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                logger.info("LLM cache exact hit")
+                return orjson.loads(entry[2])
+            self._evict(key)
+
+        query_embedding = self._embed(message)
+        if query_embedding is None or not self._embeddings:
+            return None
+
+        if self._matrix is None:
+            self._matrix_keys = list(self._embeddings.keys())
+            self._matrix = np.stack([self._embeddings[k] for k in self._matrix_keys])
+
+        scores = self._matrix @ query_embedding
+        for index in np.argsort(scores)[::-1]:
+            if scores[index] < self.similarity_threshold:
+                break
+            candidate = self._entries.get(self._matrix_keys[index])
+            if candidate is not None and candidate[1] == scope and candidate[0] > now:
+                logger.info("LLM cache semantic hit (similarity %.3f)", scores[index])
+                return orjson.loads(candidate[2])
+        return None
+
+    def set(self, model: str, instructions: str, message: Any, response: Any, history: Optional[List[Dict[str, str]]] = None) -> None:
+        """
+        Store a response in memory.
+
+        Args:
+            model (str): The model name
+            instructions (str): The system instructions
+            message (Any): The user message
+            response (Any): The LLM response to cache
+            history (Optional[List[Dict[str, str]]]): Conversation history
+        """
+        self._set(model, instructions, message, self._dumps(response), history)
+
+    def _set(self, model: str, instructions: str, message: Any, payload: bytes, history: Optional[List[Dict[str, str]]] = None) -> None:
+        """Store an already serialized response in memory."""
+        scope, key = self._keys(model, instructions, message, history)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, scope, payload)
+        self._entries.move_to_end(key)
+
+        embedding = self._embed(message)
+        if embedding is not None:
+            self._embeddings[key] = embedding
+            self._matrix = None
+
+        while len(self._entries) > self.max_size:
+            oldest_key = next(iter(self._entries))
+            self._evict(oldest_key)
+
+    async def aget(self, model: str, instructions: str, message: Any, history: Optional[List[Dict[str, str]]] = None) -> Optional[Any]:
+        """
+        Look up a cached response in memory, then in Redis if configured.
+
+        Args:
+            model (str): The model name
+            instructions (str): The system instructions
+            message (Any): The user message
+            history (Optional[List[Dict[str, str]]]): Conversation history
+
+        Returns:
+            Optional[Any]: The cached response, or None on a miss
+        """
+        response = self.get(model, instructions, message, history)
+        if response is not None or self._redis is None:
+            return response
+
+        try:
+            raw = await self._redis.get(self.cache_key(model, instructions, message, history))
+        except Exception as e:
+            logger.warning("LLM cache Redis lookup failed: %s", e)
+            return None
+        if raw is None:
+            return None
+
+        logger.info("LLM cache Redis hit")
+        self._set(model, instructions, message, raw, history)
+        return orjson.loads(raw)
+
+    async def aset(self, model: str, instructions: str, message: Any, response: Any, history: Optional[List[Dict[str, str]]] = None) -> None:
+        """
+        Store a response in memory, and in Redis if configured.
+
+        Args:
+            model (str): The model name
+            instructions (str): The system instructions
+            message (Any): The user message
+            response (Any): The LLM response to cache
+            history (Optional[List[Dict[str, str]]]): Conversation history
+        """
+        payload = self._dumps(response)
+        self._set(model, instructions, message, payload, history)
+        if self._redis is None:
+            return
+
+        try:
+            await self._redis.set(
+                self.cache_key(model, instructions, message, history),
+                payload,
+                ex=int(self.ttl_seconds)
+            )
+        except Exception as e:
+            logger.warning("LLM cache Redis write failed: %s", e)
+
+    def clear(self) -> None:
+        """Remove all cached responses from memory."""
+        self._entries.clear()
+        self._embeddings.clear()
+        self._matrix = None
+        self._matrix_keys = []
+
+
+_llm_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    """
+    Get the process-wide cache shared by all LLMs, creating it on first use.
+
+    Set LLM_CACHE_REDIS_URL to share it across processes. The variable is read on
+    first use rather than at import, so it may come from a .env file loaded later.
+
+    Returns:
+        LLMCache: The shared cache
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMCache(redis_url=os.getenv("LLM_CACHE_REDIS_URL"))
+    return _llm_cache
@@ -1,16 +1,35 @@
+import asyncio
 import os
 import re
-from typing import List, Dict, Optional
+import time
+from typing import AsyncIterator, Any, List, Dict, Optional, Tuple
 import aiohttp
-from .base_llm import BaseLLM
+from .base_llm import ROLE_LABELS, BaseLLM, get_api_key, load_env
+from .http import DEFAULT_TIMEOUT
+from .rate_limiter import LoopSemaphore
+from .json_extract import find_balanced_json, read_json_value
 import logging
-import json
-from dotenv import load_dotenv
+import orjson
 
-load_dotenv()
+load_env()
 
 logger = logging.getLogger(__name__)
 
+# Markdown code fence around JSON: ```json ... ``` or ``` ... ```. When the opening fence
+# ends its line, the closing fence must start one, so backticks inside the JSON are kept
+_FENCE_RE = re.compile(r'```(?:json)?(?:\s*\n(.*?)\n```|\s*(.*?)```)', re.DOTALL)
+
+API_ROOT = "https://generativelanguage.googleapis.com/v1beta"
+# Lifetime of an uploaded context cache, and how long before expiry it is recreated
+CONTEXT_CACHE_TTL_SECONDS = 3600
+CONTEXT_CACHE_REFRESH_MARGIN_SECONDS = 60
+
+# Maximum requests in flight to the provider, across all instances, so bursts
+# cannot exhaust the per-host connection pool or trigger rate-limit errors
+_GEMINI_SEM = LoopSemaphore(int(os.getenv("GEMINI_MAX_CONCURRENCY", "16")))
+
+_WEB_SEARCH_PROMPT = "WEB SEARCH ENABLED: You have access to real-time web search capabilities. Use this to find current, up-to-date information when needed. Always search for the most recent information when the user asks about current events, recent developments, or anything that might require current data.\n\n"
+
 class GeminiLLM(BaseLLM):
     """
     Gemini LLM implementation that inherits from BaseLLM.
@@ -21,9 +40,13 @@ class GeminiLLM(BaseLLM):
     - Configurable web search enable/disable
     - JSON response formatting
     - Conversation history support
+    - Streaming responses via server-sent events
+    - Optional context caching of the static system prompt
     """
     
-    def __init__(self, instruction: str, model: str, enable_web_search: bool = True):
+    supports_streaming = True
+    
+    def __init__(self, instruction: str, model: str, enable_web_search: bool = True, client: Optional[aiohttp.ClientSession] = None, qpm: int = 500, enable_context_cache: bool = False):
         """
         Initialize the Gemini LLM with instruction and API key.
         
@@ -31,17 +54,41 @@ class GeminiLLM(BaseLLM):
             instruction (str): The system instruction for the LLM
             model (str): The model to use
             enable_web_search (bool): Whether to enable web search functionality
+            client (Optional[aiohttp.ClientSession]): Session to use instead of the shared one
+            qpm (int): Maximum queries per minute shared by all instances of this LLM
+            enable_context_cache (bool): Whether to upload the system prompt once as cached
+                content and reference it by name, instead of resending it with every request
         """
-        super().__init__(instruction, "gemini")
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        self.base_url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+        super().__init__(instruction, "gemini", client=client, qpm=qpm)
+        self.api_key = get_api_key("GEMINI_API_KEY")
+        self.model = model
+        self.base_url = f"{API_ROOT}/models/{model}:generateContent"
+        self.stream_url = f"{API_ROOT}/models/{model}:streamGenerateContent"
         self.enable_web_search = enable_web_search
-        
-        if not self.api_key:
-            logger.error("GEMINI_API_KEY environment variable is not set!")
-            raise ValueError("GEMINI_API_KEY environment variable is required")
+        self.enable_context_cache = enable_context_cache
+        # Request constants, built once instead of on every query
+        self._headers = {"Content-Type": "application/json"}
+        self._params = {"key": self.api_key}
+        self._stream_params = {"key": self.api_key, "alt": "sse"}
+        self._timeout = DEFAULT_TIMEOUT
+        # instruction -> (cached content name or None if caching was refused, expires_at)
+        self._context_caches: Dict[str, Tuple[Optional[str], float]] = {}
+        self._context_cache_lock = asyncio.Lock()
+        # (instruction, enable_web_search) -> prompt preamble
+        self._preamble_cache: Dict[Tuple[str, bool], str] = {}
     
-    async def query(self, instruction: str, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+    def _get_warmup_request(self) -> Optional[Dict]:
+        """
+        Get the model metadata request used to warm up the connection.
+        It is free, and also confirms the API key and model are valid.
+        """
+        return {
+            "method": "GET",
+            "url": f"{API_ROOT}/models/{self.model}",
+            "params": self._params
+        }
+    
+    async def query(self, instruction: str, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
         """
         Query the Gemini LLM with a prompt and optional conversation history.
         
@@ -51,157 +98,281 @@ class GeminiLLM(BaseLLM):
                 [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}]
         
         Returns:
-            str: The Gemini LLM's response
+            Dict[str, Any]: The Gemini LLM's response, as returned by _ensure_json_response
         """
         try:
-            # Prepare the full prompt with instruction and history
-            full_prompt = self._prepare_prompt(instruction, prompt, history)
-
-            logger.info("Full prompt: %s", full_prompt)
-            
-            # Prepare the request payload
-            payload = {
-                "contents": [{
-                    "parts": [{
-                        "text": full_prompt
-                    }]
-                }]
-            }
+            # Argument formatting below is skipped entirely when INFO logging is off
+            log_info = logger.isEnabledFor(logging.INFO)
             
-            # Add web search tool if enabled
-            if self.enable_web_search:
-                payload["tools"] = [{
-                    "google_search": {}
-                }]
+            # Prepare the request payload with instruction and history
+            payload = await self._build_payload(instruction, prompt, history)
             
-            logger.info("Payload: %s", payload)
+            if log_info:
+                logger.info("Payload: %s", payload)
             
             # Make API request
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            params = {
-                "key": self.api_key
-            }
-            
-            logger.info("API Key present: %s", bool(self.api_key))
-            logger.info("API Key length: %s", len(self.api_key) if self.api_key else 0)
-            logger.info("Request URL: %s", self.base_url)
-            logger.info("Request params: %s", params)
+            if log_info:
+                logger.info("API Key present: %s", bool(self.api_key))
+                logger.info("API Key length: %s", len(self.api_key) if self.api_key else 0)
+                logger.info("Request URL: %s", self.base_url)
+                logger.info("Request params: %s", self._params)
             
             logger.info("Starting API request...")
-            async with aiohttp.ClientSession() as session:
-                logger.info("Client session created, making POST request...")
+            session = self._get_client()
+            logger.info("Using shared client session, making POST request...")
+            async with self._rate_limiter, _GEMINI_SEM:
                 async with session.post(
                     self.base_url,
-                    headers=headers,
-                    params=params,
+                    headers=self._headers,
+                    params=self._params,
                     json=payload,
-                    timeout=aiohttp.ClientTimeout(total=300)
+                    timeout=self._timeout
                 ) as response:
                     logger.info("Response received, processing...")
                     logger.info("Response status: %s", response.status)
                     
                     if response.status == 200:
-                        result = await response.json()
-                        logger.info("API response structure: %s", list(result.keys()))
+                        # Parse the body incrementally and stop at the response text,
+                        # instead of buffering and decoding the whole document first
+                        response_text = await read_json_value(response.content, "candidates.item.content.parts.item.text")
+                        # Drain the short remainder (usage metadata) so the connection is reused
+                        await response.read()
                         
-                        if "candidates" in result and len(result["candidates"]) > 0:
-                            candidate = result["candidates"][0]
-                            logger.info("Candidate structure: %s", list(candidate.keys()))
-                            
-                            if "content" in candidate and "parts" in candidate["content"]:
-                                response_text = candidate["content"]["parts"][0].get("text", "No response generated")
-                                logger.info("Response text length: %s", len(response_text))
-                                return self._ensure_json_response(response_text)
-                            else:
-                                logger.error(f"No content/parts in candidate: {candidate}")
-                        else:
-                            logger.error(f"No candidates in response: {result}")
-                        return self._ensure_json_response("No response generated")
+                        if response_text is None:
+                            logger.error("No candidates with text in response")
+                            return self._ensure_json_response("No response generated")
+                        
+                        if log_info:
+                            logger.info("Response text length: %s", len(response_text))
+                        return self._ensure_json_response(response_text)
                     else:
                         response_text = await response.text()
-                        logger.error(f"Gemini API returned error status {response.status}")
-                        logger.error(f"Response headers: {dict(response.headers)}")
-                        logger.error(f"Response body: {response_text}")
+                        logger.error("Gemini API returned error status %s", response.status)
+                        if logger.isEnabledFor(logging.ERROR):
+                            logger.error("Response headers: %s", dict(response.headers))
+                        logger.error("Response body: %s", response_text)
                         raise Exception(f"API Error {response.status}: {response_text}")
 
         except Exception as e:
-            logger.error(f"Error in Gemini LLM query: {type(e).__name__}: {str(e)}")
-            logger.error(f"Full exception details: {repr(e)}")
-            logger.error(f"Exception args: {e.args}")
-            logger.error(f"Exception dir: {[attr for attr in dir(e) if not attr.startswith('_')]}")
+            logger.error("Error in Gemini LLM query: %s: %s", type(e).__name__, e)
+            logger.error("Full exception details: %r", e)
+            logger.error("Exception args: %s", e.args)
             raise Exception(f"Error generating response: {type(e).__name__}: {str(e)}") from e
     
-    def _ensure_json_response(self, response_text: str) -> str:
+    async def query_stream(self, instruction: str, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
         """
-        Ensure the response is in valid JSON format.
-        If the response is not valid JSON, wrap it in a JSON object.
+        Query the Gemini LLM and yield the response text as it is generated.
+        
+        Args:
+            instruction (str): The system instruction for the LLM
+            prompt (str): The user's prompt/query
+            history (Optional[List[Dict[str, str]]]): Conversation history
+        
+        Yields:
+            str: Chunks of the raw response text, in order
+        """
+        payload = await self._build_payload(instruction, prompt, history)
+        
+        logger.info("Starting streaming API request...")
+        session = self._get_client()
+        async with self._rate_limiter, _GEMINI_SEM:
+            async with session.post(
+                self.stream_url,
+                headers=self._headers,
+                params=self._stream_params,
+                json=payload,
+                timeout=self._timeout
+            ) as response:
+                if response.status != 200:
+                    response_text = await response.text()
+                    logger.error("Gemini API returned error status %s", response.status)
+                    logger.error("Response body: %s", response_text)
+                    raise Exception(f"API Error {response.status}: {response_text}")
+                
+                # Each server-sent event carries one partial GenerateContentResponse
+                async for line in response.content:
+                    line = line.strip()
+                    if not line.startswith(b"data:"):
+                        continue
+                    
+                    event = orjson.loads(line[5:])
+                    for candidate in event.get("candidates", [])[:1]:
+                        for part in candidate.get("content", {}).get("parts", []):
+                            text = part.get("text")
+                            if text:
+                                yield text
+    
+    async def _build_payload(self, instruction: str, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> Dict:
+        """
+        Build the generateContent request payload.
+        
+        When context caching is enabled and the cache is available, the system prompt
+        and tools are referenced by cached content name and only the conversation is sent.
+        
+        Args:
+            instruction (str): The system instruction for the LLM
+            prompt (str): The current user prompt
+            history (Optional[List[Dict[str, str]]]): Conversation history
+        
+        Returns:
+            Dict: The request payload
+        """
+        cached_content = await self._get_cached_content(instruction) if self.enable_context_cache else None
+        
+        if cached_content:
+            # Cached content already carries the system prompt and tools, and the
+            # API rejects requests that set them again
+            return {
+                "contents": [{
+                    "parts": [{
+                        "text": self._prepare_conversation(prompt, history)
+                    }]
+                }],
+                "cachedContent": cached_content
+            }
+        
+        payload = {
+            "contents": [{
+                "parts": [{
+                    "text": self._prepare_prompt(instruction, prompt, history)
+                }]
+            }]
+        }
+        
+        # Add web search tool if enabled
+        if self.enable_web_search:
+            payload["tools"] = [{
+                "google_search": {}
+            }]
+        
+        return payload
+    
+    async def _get_cached_content(self, instruction: str) -> Optional[str]:
+        """
+        Get the cached content name for an instruction, creating or refreshing it as needed.
+        
+        Caching is refused by the API for prompts below the model's minimum token count;
+        that result is remembered for the cache TTL so it is not retried on every request.
+        
+        Args:
+            instruction (str): The system instruction for the LLM
+        
+        Returns:
+            Optional[str]: The cached content name, or None if the prompt is sent inline
+        """
+        entry = self._context_caches.get(instruction)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        
+        async with self._context_cache_lock:
+            # Another request may have created it while we waited
+            entry = self._context_caches.get(instruction)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+            
+            payload = {
+                "model": f"models/{self.model}",
+                "systemInstruction": {
+                    "parts": [{
+                        "text": self._get_preamble(instruction)
+                    }]
+                },
+                "ttl": f"{CONTEXT_CACHE_TTL_SECONDS}s"
+            }
+            if self.enable_web_search:
+                payload["tools"] = [{
+                    "google_search": {}
+                }]
+            
+            name = None
+            try:
+                session = self._get_client()
+                async with session.post(
+                    f"{API_ROOT}/cachedContents",
+                    headers=self._headers,
+                    params=self._params,
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=60)
+                ) as response:
+                    if response.status == 200:
+                        name = orjson.loads(await response.read()).get("name")
+                        logger.info("Created Gemini context cache %s", name)
+                    else:
+                        logger.warning("Gemini context caching unavailable (status %s): %s", response.status, await response.text())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning("Failed to create Gemini context cache: %s", e)
+            
+            expires_at = time.monotonic() + CONTEXT_CACHE_TTL_SECONDS - CONTEXT_CACHE_REFRESH_MARGIN_SECONDS
+            self._context_caches[instruction] = (name, expires_at)
+            return name
+    
+    def _ensure_json_response(self, response_text: str) -> Dict[str, Any]:
+        """
+        Parse the response as JSON.
+        If the response is not valid JSON, wrap the raw text instead.
         
         Args:
             response_text (str): The raw response text from the LLM
         
         Returns:
-            str: Valid JSON string
+            Dict[str, Any]: {"response": parsed JSON, "status": "success"}, or with the raw
+                text as "response" and "format": "wrapped" when no JSON could be parsed
         """
-        try:
-            # Try to parse the response as JSON directly
-            parsed_json = json.loads(response_text)
-            return parsed_json
-        except (json.JSONDecodeError, TypeError):
-            # If not valid JSON, try to extract JSON from markdown code blocks
+        # Only attempt a direct parse when the text can be a JSON object or array;
+        # markdown-wrapped or prose responses go straight to extraction
+        if response_text.lstrip()[:1] in ("{", "["):
             try:
-                # Look for JSON wrapped in ```json ... ``` or ``` ... ```
-                json_patterns = [
-                    r'```json\s*\n(.*?)\n```',  # ```json ... ```
-                    r'```\s*\n(.*?)\n```',      # ``` ... ```
-                    r'```json\s*(.*?)```',      # ```json ... ``` (no newlines)
-                    r'```\s*(.*?)```'           # ``` ... ``` (no newlines)
-                ]
+                # Try to parse the response as JSON directly
+                parsed_json = orjson.loads(response_text)
+                return {
+                    "response": parsed_json,
+                    "status": "success",
+                }
+            except (orjson.JSONDecodeError, TypeError):
+                pass
+        
+        # If not valid JSON, try to extract JSON from markdown code blocks
+        try:
+            # Look for JSON wrapped in ```json ... ``` or ``` ... ```
+            json_match = _FENCE_RE.search(response_text)
+            if json_match:
+                json_text = json_match.group(json_match.lastindex).strip()
+                parsed_json = orjson.loads(json_text)
+                logger.info("Successfully extracted JSON from markdown: %s", type(parsed_json))
+                return {
+                    "response": parsed_json,
+                    "status": "success",
+                }
+            
+            # Try to extract JSON array or object from the text
+            json_text = find_balanced_json(response_text, "[")
+            if json_text:
+                parsed_json = orjson.loads(json_text)
+                logger.info("Successfully extracted JSON array: %s", type(parsed_json))
+                return {
+                    "response": parsed_json,
+                    "status": "success",
+                }
                 
-                for pattern in json_patterns:
-                    json_match = re.search(pattern, response_text, re.DOTALL)
-                    if json_match:
-                        json_text = json_match.group(1).strip()
-                        parsed_json = json.loads(json_text)
-                        logger.info("Successfully extracted JSON from markdown: %s", type(parsed_json))
-                        return {
-                            "response": parsed_json,
-                            "status": "success",
-                        }
+            json_text = find_balanced_json(response_text, "{")
+            if json_text:
+                parsed_json = orjson.loads(json_text)
+                logger.info("Successfully extracted JSON object: %s", type(parsed_json))
+                return {
+                    "response": parsed_json,
+                    "status": "success",
+                }
                 
-                # Try to extract JSON array or object from the text
-                array_match = re.search(r'\[.*?\]', response_text, re.DOTALL)
-                if array_match:
-                    json_text = array_match.group()
-                    parsed_json = json.loads(json_text)
-                    logger.info("Successfully extracted JSON array: %s", type(parsed_json))
-                    return {
-                        "response": parsed_json,
-                        "status": "success",
-                    }
-                    
-                object_match = re.search(r'\{.*?\}', response_text, re.DOTALL)
-                if object_match:
-                    json_text = object_match.group()
-                    parsed_json = json.loads(json_text)
-                    logger.info("Successfully extracted JSON object: %s", type(parsed_json))
-                    return {
-                        "response": parsed_json,
-                        "status": "success",
-                    }
-                    
-            except (json.JSONDecodeError, AttributeError) as e:
-                logger.warning("Failed to extract JSON from response: %s", e)
-            
-            # If all else fails, wrap the response in a JSON object
-            logger.warning("Could not parse JSON from response, wrapping: %s...", response_text[:100])
-            return {
-                "response": response_text,
-                "status": "success",
-                "format": "wrapped"
-            }
+        except (orjson.JSONDecodeError, AttributeError) as e:
+            logger.warning("Failed to extract JSON from response: %s", e)
+        
+        # If all else fails, wrap the response in a JSON object
+        logger.warning("Could not parse JSON from response, wrapping: %s...", response_text[:100])
+        return {
+            "response": response_text,
+            "status": "success",
+            "format": "wrapped"
+        }
     
     def _prepare_prompt(self, instruction: str, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
         """
@@ -214,27 +385,59 @@ class GeminiLLM(BaseLLM):
         Returns:
             str: The formatted prompt ready for the LLM
         """
-        # Start with the system instruction and JSON format requirement
-        full_prompt = f"System Instruction: {instruction}\n\n"
-        full_prompt += "IMPORTANT: You must ALWAYS respond with valid JSON format. No matter what the question or request is, your response must be a valid JSON object. Do not include any text outside of the JSON structure.\n\n"
+        return self._get_preamble(instruction) + self._prepare_conversation(prompt, history)
+    
+    def _get_preamble(self, instruction: str) -> str:
+        """
+        Get the static part of the prompt: the system instruction, JSON format
+        requirement and web search information. Built once per instruction and
+        web search setting.
         
-        # Add web search capability information if enabled
-        if self.enable_web_search:
-            full_prompt += "WEB SEARCH ENABLED: You have access to real-time web search capabilities. Use this to find current, up-to-date information when needed. Always search for the most recent information when the user asks about current events, recent developments, or anything that might require current data.\n\n"
+        Args:
+            instruction (str): The system instruction for the LLM
+        
+        Returns:
+            str: The prompt preamble
+        """
+        key = (instruction, self.enable_web_search)
+        preamble = self._preamble_cache.get(key)
+        if preamble is None:
+            # Start with the system instruction and JSON format requirement
+            preamble = self._get_instruction_prompt(instruction)
+            
+            # Add web search capability information if enabled
+            if self.enable_web_search:
+                preamble += _WEB_SEARCH_PROMPT
+            
+            self._preamble_cache[key] = preamble
+        return preamble
+    
+    def _prepare_conversation(self, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+        """
+        Prepare the per-request part of the prompt: conversation history and the current prompt.
+        
+        Args:
+            prompt (str): The current user prompt
+            history (Optional[List[Dict[str, str]]]): Conversation history
+        
+        Returns:
+            str: The formatted conversation
+        """
+        parts = []
         
         # Add conversation history if provided
         if history:
-            full_prompt += "Conversation History:\n"
+            parts.append("Conversation History:\n")
             for message in history:
                 role = message.get("role", "user")
-                content = message.get("content", "")
-                full_prompt += f"{role.title()}: {content}\n"
-            full_prompt += "\n"
+                label = ROLE_LABELS.get(role) or role.title()
+                parts.append(f"{label}: {message.get('content', '')}\n")
+            parts.append("\n")
         
         # Add the current prompt
-        full_prompt += f"User: {prompt}\nAssistant:"
+        parts.append(f"User: {prompt}\nAssistant:")
         
-        return full_prompt
+        return "".join(parts)
     
     def set_web_search(self, enabled: bool) -> None:
         """
@@ -244,4 +447,7 @@ class GeminiLLM(BaseLLM):
             enabled (bool): Whether to enable web search
         """
         self.enable_web_search = enabled
+        # Drop preambles and cached contents built for the previous setting
+        self._preamble_cache.clear()
+        self._context_caches.clear()
         logger.info("Web search %s", 'enabled' if enabled else 'disabled')
@@ -0,0 +1,46 @@
+import logging
+from typing import Optional
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Connection pool shared by every LLM provider
+POOL_LIMIT = 100
+POOL_LIMIT_PER_HOST = 20
+KEEPALIVE_TIMEOUT_SECONDS = 30
+DNS_CACHE_TTL_SECONDS = 300
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=300, connect=10)
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Get the process-wide HTTP session, creating it lazily on first use.
+    Must be called from inside a running event loop.
+    
+    The session keeps TCP/TLS connections alive and caches DNS lookups,
+    so repeated LLM queries do not pay for a new handshake each time.
+    
+    Returns:
+        aiohttp.ClientSession: The shared session
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            limit_per_host=POOL_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT_SECONDS,
+            ttl_dns_cache=DNS_CACHE_TTL_SECONDS
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=DEFAULT_TIMEOUT)
+        logger.info("Created shared HTTP session")
+    return _session
+
+
+async def close_session() -> None:
+    """Close the process-wide HTTP session. Call this on application shutdown."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,63 @@
+from typing import Any, Optional
+import ijson
+
+
+def find_balanced_json(text: str, opener: str) -> Optional[str]:
+    """
+    Find the first balanced JSON array or object in a text.
+    
+    Scans forward from the first opener, counting brackets outside of string
+    literals, so the cost is linear in the length of the text and nested
+    values are returned whole.
+    
+    Args:
+        text (str): The text to search
+        opener (str): "[" to find an array, "{" to find an object
+    
+    Returns:
+        Optional[str]: The slice from the opener to its matching closer, or None
+    """
+    start = text.find(opener)
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return None
+
+
+async def read_json_value(stream: Any, path: str) -> Any:
+    """
+    Incrementally parse a JSON stream and return the first value at a path.
+    
+    The stream is read in chunks and parsing stops as soon as the value is
+    complete, so the rest of the document is never decoded.
+    
+    Args:
+        stream (Any): Object with an async read(n) method, e.g. aiohttp's response.content
+        path (str): ijson prefix of the value, e.g. "choices.item.message.content"
+    
+    Returns:
+        Any: The first value at the path, or None if the document has none
+    """
+    async for value in ijson.items_async(stream, path, use_float=True):
+        return value
+    return None
@@ -1,16 +1,28 @@
 import os
 import re
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 import aiohttp
-from .base_llm import BaseLLM
+from .base_llm import ROLE_LABELS, BaseLLM, get_api_key, load_env
+from .http import DEFAULT_TIMEOUT
+from .rate_limiter import LoopSemaphore
+from .json_extract import find_balanced_json, read_json_value
 import logging
-import json
-from dotenv import load_dotenv
+import orjson
 
-load_dotenv()
+load_env()
 
 logger = logging.getLogger(__name__)
 
+# Maximum requests in flight to the provider, across all instances, so bursts
+# cannot exhaust the per-host connection pool or trigger rate-limit errors
+_PERPLEXITY_SEM = LoopSemaphore(int(os.getenv("PERPLEXITY_MAX_CONCURRENCY", "16")))
+
+_WEB_SEARCH_PROMPT = "WEB SEARCH ENABLED: You have access to real-time web search capabilities through Perplexity. Use this to find current, up-to-date information when needed. Always search for the most recent information when the user asks about current events, recent developments, or anything that might require current data.\n\n"
+
+# Markdown code fence around JSON: ```json ... ``` or ``` ... ```. When the opening fence
+# ends its line, the closing fence must start one, so backticks inside the JSON are kept
+_FENCE_RE = re.compile(r'```(?:json)?(?:\s*\n(.*?)\n```|\s*(.*?)```)', re.DOTALL)
+
 class PerplexityLLM(BaseLLM):
     """
     Perplexity LLM implementation that inherits from BaseLLM.
@@ -24,7 +36,7 @@ class PerplexityLLM(BaseLLM):
     - Multiple model support (llama-3.1-sonar, llama-3.1-sonar-128k, etc.)
     """
     
-    def __init__(self, instruction: str, model: str = "sonar", enable_web_search: bool = True):
+    def __init__(self, instruction: str, model: str = "sonar", enable_web_search: bool = True, client: Optional[aiohttp.ClientSession] = None, qpm: int = 500):
         """
         Initialize the Perplexity LLM with instruction and API key.
         
@@ -32,18 +44,22 @@ class PerplexityLLM(BaseLLM):
             instruction (str): The system instruction for the LLM
             model (str): The model to use (default: llama-3.1-sonar)
             enable_web_search (bool): Whether to enable web search functionality
+            client (Optional[aiohttp.ClientSession]): Session to use instead of the shared one
+            qpm (int): Maximum queries per minute shared by all instances of this LLM
         """
-        super().__init__(instruction, "perplexity")
-        self.api_key = os.getenv("PERPLEXITY_API_KEY")
+        super().__init__(instruction, "perplexity", client=client, qpm=qpm)
+        self.api_key = get_api_key("PERPLEXITY_API_KEY")
         self.base_url = "https://api.perplexity.ai/chat/completions"
         self.model = model
         self.enable_web_search = enable_web_search
-        
-        if not self.api_key:
-            logger.error("PERPLEXITY_API_KEY environment variable is not set!")
-            raise ValueError("PERPLEXITY_API_KEY environment variable is required")
+        # Request constants, built once instead of on every query
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        self._timeout = DEFAULT_TIMEOUT
     
-    async def query(self, instruction: str, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+    async def query(self, instruction: str, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
         """
         Query the Perplexity LLM with a prompt and optional conversation history.
         
@@ -54,13 +70,14 @@ class PerplexityLLM(BaseLLM):
                 [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}]
         
         Returns:
-            str: The Perplexity LLM's response
+            Dict[str, Any]: The Perplexity LLM's response, as returned by _ensure_json_response
         """
         try:
-            # Prepare the full prompt with instruction and history
-            full_prompt = self._prepare_prompt(instruction, prompt, history)
-
-            logger.info("Full prompt: %s", full_prompt)
+            # Argument formatting below is skipped entirely when INFO logging is off
+            log_info = logger.isEnabledFor(logging.INFO)
+            
+            if log_info:
+                logger.info("Full prompt: %s", self._prepare_prompt(instruction, prompt, history))
             
             # Prepare the request payload
             messages = []
@@ -96,136 +113,128 @@ class PerplexityLLM(BaseLLM):
                 "stream": False
             }
             
-            logger.info("Payload: %s", payload)
+            if log_info:
+                logger.info("Payload: %s", payload)
             
             # Make API request
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            logger.info("API Key present: %s", bool(self.api_key))
-            logger.info("API Key length: %s", len(self.api_key) if self.api_key else 0)
-            logger.info("Request URL: %s", self.base_url)
+            if log_info:
+                logger.info("API Key present: %s", bool(self.api_key))
+                logger.info("API Key length: %s", len(self.api_key) if self.api_key else 0)
+                logger.info("Request URL: %s", self.base_url)
             
             logger.info("Starting API request...")
-            async with aiohttp.ClientSession() as session:
-                logger.info("Client session created, making POST request...")
+            session = self._get_client()
+            logger.info("Using shared client session, making POST request...")
+            async with self._rate_limiter, _PERPLEXITY_SEM:
                 async with session.post(
                     self.base_url,
-                    headers=headers,
+                    headers=self._headers,
                     json=payload,
-                    timeout=aiohttp.ClientTimeout(total=300)
+                    timeout=self._timeout
                 ) as response:
                     logger.info("Response received, processing...")
                     logger.info("Response status: %s", response.status)
                     
                     if response.status == 200:
-                        result = await response.json()
-                        logger.info("API response structure: %s", list(result.keys()))
+                        # Parse the body incrementally and stop at the response text,
+                        # instead of buffering and decoding the whole document first
+                        response_text = await read_json_value(response.content, "choices.item.message.content")
+                        # Drain the short remainder (usage metadata) so the connection is reused
+                        await response.read()
                         
-                        if "choices" in result and len(result["choices"]) > 0:
-                            choice = result["choices"][0]
-                            logger.info("Choice structure: %s", list(choice.keys()))
-                            
-                            if "message" in choice and "content" in choice["message"]:
-                                response_text = choice["message"]["content"]
-                                logger.info("Response text length: %s", len(response_text))
-                                return self._ensure_json_response(response_text)
-                            else:
-                                logger.error(f"No message/content in choice: {choice}")
-                        else:
-                            logger.error(f"No choices in response: {result}")
-                        return self._ensure_json_response("No response generated")
+                        if response_text is None:
+                            logger.error("No choices with message content in response")
+                            return self._ensure_json_response("No response generated")
+                        
+                        if log_info:
+                            logger.info("Response text length: %s", len(response_text))
+                        return self._ensure_json_response(response_text)
                     else:
                         response_text = await response.text()
-                        logger.error(f"Perplexity API returned error status {response.status}")
-                        logger.error(f"Response headers: {dict(response.headers)}")
-                        logger.error(f"Response body: {response_text}")
+                        logger.error("Perplexity API returned error status %s", response.status)
+                        if logger.isEnabledFor(logging.ERROR):
+                            logger.error("Response headers: %s", dict(response.headers))
+                        logger.error("Response body: %s", response_text)
                         raise Exception(f"API Error {response.status}: {response_text}")
 
         except Exception as e:
-            logger.error(f"Error in Perplexity LLM query: {type(e).__name__}: {str(e)}")
-            logger.error(f"Full exception details: {repr(e)}")
-            logger.error(f"Exception args: {e.args}")
-            logger.error(f"Exception dir: {[attr for attr in dir(e) if not attr.startswith('_')]}")
+            logger.error("Error in Perplexity LLM query: %s: %s", type(e).__name__, e)
+            logger.error("Full exception details: %r", e)
+            logger.error("Exception args: %s", e.args)
             raise Exception(f"Error generating response: {type(e).__name__}: {str(e)}") from e
     
-    def _ensure_json_response(self, response_text: str) -> str:
+    def _ensure_json_response(self, response_text: str) -> Dict[str, Any]:
         """
-        Ensure the response is in valid JSON format.
-        If the response is not valid JSON, wrap it in a JSON object.
+        Parse the response as JSON.
+        If the response is not valid JSON, wrap the raw text instead.
         
         Args:
             response_text (str): The raw response text from the LLM
         
         Returns:
-            str: Valid JSON string
+            Dict[str, Any]: {"response": parsed JSON, "status": "success"}, or with the raw
+                text as "response" and "format": "wrapped" when no JSON could be parsed
         """
-        try:
-            # Try to parse the response as JSON directly
-            parsed_json = json.loads(response_text)
-            return {
-                "response": parsed_json,
-                "status": "success",
-            }
-        except (json.JSONDecodeError, TypeError):
-            # If not valid JSON, try to extract JSON from markdown code blocks
+        # Only attempt a direct parse when the text can be a JSON object or array;
+        # markdown-wrapped or prose responses go straight to extraction
+        if response_text.lstrip()[:1] in ("{", "["):
             try:
-                # Look for JSON wrapped in ```json ... ``` or ``` ... ```
-                json_patterns = [
-                    r'```json\s*\n(.*?)\n```',  # ```json ... ```
-                    r'```\s*\n(.*?)\n```',      # ``` ... ```
-                    r'```json\s*(.*?)```',      # ```json ... ``` (no newlines)
-                    r'```\s*(.*?)```'           # ``` ... ``` (no newlines)
-                ]
+                # Try to parse the response as JSON directly
+                parsed_json = orjson.loads(response_text)
+                return {
+                    "response": parsed_json,
+                    "status": "success",
+                }
+            except (orjson.JSONDecodeError, TypeError):
+                pass
+        
+        # If not valid JSON, try to extract JSON from markdown code blocks
+        try:
+            # Look for JSON wrapped in ```json ... ``` or ``` ... ```
+            json_match = _FENCE_RE.search(response_text)
+            if json_match:
+                json_text = json_match.group(json_match.lastindex).strip()
+                parsed_json = orjson.loads(json_text)
+                logger.info("Successfully extracted JSON from markdown: %s", type(parsed_json))
+                return {
+                    "response": parsed_json,
+                    "status": "success",
+                }
+            
+            # Try to extract JSON array or object from the text
+            json_text = find_balanced_json(response_text, "[")
+            if json_text:
+                parsed_json = orjson.loads(json_text)
+                logger.info("Successfully extracted JSON array: %s", type(parsed_json))
+                return {
+                    "response": parsed_json,
+                    "status": "success",
+                }
                 
-                for pattern in json_patterns:
-                    json_match = re.search(pattern, response_text, re.DOTALL)
-                    if json_match:
-                        json_text = json_match.group(1).strip()
-                        parsed_json = json.loads(json_text)
-                        logger.info("Successfully extracted JSON from markdown: %s", type(parsed_json))
-                        return {
-                            "response": parsed_json,
-                            "status": "success",
-                        }
+            json_text = find_balanced_json(response_text, "{")
+            if json_text:
+                parsed_json = orjson.loads(json_text)
+                logger.info("Successfully extracted JSON object: %s", type(parsed_json))
+                return {
+                    "response": parsed_json,
+                    "status": "success",
+                }
                 
-                # Try to extract JSON array or object from the text
-                array_match = re.search(r'\[.*?\]', response_text, re.DOTALL)
-                if array_match:
-                    json_text = array_match.group()
-                    parsed_json = json.loads(json_text)
-                    logger.info("Successfully extracted JSON array: %s", type(parsed_json))
-                    return {
-                        "response": parsed_json,
-                        "status": "success",
-                    }
-                    
-                object_match = re.search(r'\{.*?\}', response_text, re.DOTALL)
-                if object_match:
-                    json_text = object_match.group()
-                    parsed_json = json.loads(json_text)
-                    logger.info("Successfully extracted JSON object: %s", type(parsed_json))
-                    return {
-                        "response": parsed_json,
-                        "status": "success",
-                    }
-                    
-            except (json.JSONDecodeError, AttributeError) as e:
-                logger.warning("Failed to extract JSON from response: %s", e)
-            
-            # If all else fails, wrap the response in a JSON object
-            logger.warning("Could not parse JSON from response, wrapping: %s...", response_text[:100])
-            return {
-                "response": response_text,
-                "status": "success",
-                "format": "wrapped"
-            }
+        except (orjson.JSONDecodeError, AttributeError) as e:
+            logger.warning("Failed to extract JSON from response: %s", e)
+        
+        # If all else fails, wrap the response in a JSON object
+        logger.warning("Could not parse JSON from response, wrapping: %s...", response_text[:100])
+        return {
+            "response": response_text,
+            "status": "success",
+            "format": "wrapped"
+        }
     
     def _prepare_prompt(self, instruction: str, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> str:
         """
         Prepare the full prompt including instruction and conversation history.
+        Only used for logging; requests send the instruction and prompt as chat messages.
         
         Args:
             instruction (str): The system instruction
@@ -235,27 +244,41 @@ class PerplexityLLM(BaseLLM):
         Returns:
             str: The formatted prompt ready for the LLM
         """
-        # Start with the system instruction and JSON format requirement
-        full_prompt = f"System Instruction: {instruction}\n\n"
-        full_prompt += "IMPORTANT: You must ALWAYS respond with valid JSON format. No matter what the question or request is, your response must be a valid JSON object. Do not include any text outside of the JSON structure.\n\n"
-        
-        # Add web search capability information if enabled
-        if self.enable_web_search:
-            full_prompt += "WEB SEARCH ENABLED: You have access to real-time web search capabilities through Perplexity. Use this to find current, up-to-date information when needed. Always search for the most recent information when the user asks about current events, recent developments, or anything that might require current data.\n\n"
+        # Start with the system instruction, JSON format requirement and web search information
+        parts = [self._get_preamble(instruction)]
         
         # Add conversation history if provided
         if history:
-            full_prompt += "Conversation History:\n"
+            parts.append("Conversation History:\n")
             for message in history:
                 role = message.get("role", "user")
-                content = message.get("content", "")
-                full_prompt += f"{role.title()}: {content}\n"
-            full_prompt += "\n"
+                label = ROLE_LABELS.get(role) or role.title()
+                parts.append(f"{label}: {message.get('content', '')}\n")
+            parts.append("\n")
         
         # Add the current prompt
-        full_prompt += f"User: {prompt}\nAssistant:"
+        parts.append(f"User: {prompt}\nAssistant:")
+        
+        return "".join(parts)
+    
+    def _get_preamble(self, instruction: str) -> str:
+        """
+        Get the static part of the prompt: the system instruction, JSON format
+        requirement and web search information.
+        
+        Args:
+            instruction (str): The system instruction
+        
+        Returns:
+            str: The prompt preamble
+        """
+        preamble = self._get_instruction_prompt(instruction)
+        
+        # Add web search capability information if enabled
+        if self.enable_web_search:
+            preamble += _WEB_SEARCH_PROMPT
         
-        return full_prompt
+        return preamble
     
     def set_web_search(self, enabled: bool) -> None:
         """
@@ -0,0 +1,108 @@
+import asyncio
+import time
+import weakref
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def get_for_running_loop(per_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, T]", factory: Callable[[], T]) -> T:
+    """
+    Get the running loop's entry of a per-loop map, creating it on first use.
+    
+    asyncio primitives bind to the loop that first waits on them, so objects shared at
+    module or class level keep one primitive per loop. Entries go away with their loop.
+    
+    Args:
+        per_loop (weakref.WeakKeyDictionary): Map of event loop to its primitive
+        factory (Callable[[], T]): Creates the primitive for a new loop
+    
+    Returns:
+        T: The running loop's primitive
+    """
+    loop = asyncio.get_running_loop()
+    value = per_loop.get(loop)
+    if value is None:
+        value = per_loop[loop] = factory()
+    return value
+
+
+class AsyncTokenBucket:
+    """
+    Async token bucket that limits how many requests start per minute.
+    
+    Use it as an async context manager around each outbound request:
+    
+        async with bucket:
+            await send_request()
+    """
+    
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Initialize the token bucket.
+        
+        Args:
+            rate_per_minute (float): Number of requests allowed per minute
+            capacity (Optional[float]): Maximum burst size. Defaults to rate_per_minute.
+        """
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        # Buckets are shared by every instance of an LLM type, so the lock is per event loop
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+    
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with get_for_running_loop(self._locks, asyncio.Lock):
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+                self._updated_at = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self._tokens) / self.rate_per_second)
+    
+    async def __aenter__(self) -> "AsyncTokenBucket":
+        await self.acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+class LoopSemaphore:
+    """
+    Async semaphore that can be created at import time and used from any event loop.
+    
+    Each event loop gets its own asyncio.Semaphore with the same limit, created on
+    first use, so module-level limits keep working across repeated asyncio.run
+    calls, test runners and server reloads.
+    
+        async with semaphore:
+            await send_request()
+    """
+    
+    def __init__(self, value: int):
+        """
+        Initialize the semaphore.
+        
+        Args:
+            value (int): Maximum number of holders at once, per event loop
+        """
+        self.value = value
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        return get_for_running_loop(self._semaphores, lambda: asyncio.Semaphore(self.value))
+    
+    async def __aenter__(self) -> "LoopSemaphore":
+        await self._get_semaphore().acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        self._get_semaphore().release()
+        return False
@@ -0,0 +1,127 @@
+import logging
+from typing import Any, List
+import orjson
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = " \t\r\n"
+
+
+class InvalidArrayItem:
+    """
+    A streamed array item that is not valid JSON.
+
+    It is returned in the item's place so the caller can treat it as a failed item
+    and have it regenerated, instead of silently dropping it.
+    """
+
+    def __init__(self, text: str, error: str):
+        self.text = text
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"InvalidArrayItem({self.text!r}, {self.error!r})"
+
+
+class JSONArrayItemParser:
+    """
+    Incremental parser that extracts the items of a streamed top-level JSON array.
+
+    Text is fed in arbitrary chunks as it arrives from the LLM; every item is
+    returned as soon as it is complete (its closing bracket for objects and arrays,
+    the following ',' or ']' for strings, numbers and literals), so it can be
+    processed before the rest of the response has been generated. Items that fail
+    to parse are returned as InvalidArrayItem. Any text before the opening '['
+    (such as a ```json fence) is ignored. If the first JSON token is '{' instead,
+    the response is not a top-level array and no items are returned.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        # Whether a string, number or literal item is being read
+        self._in_primitive = False
+        self._done = False
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Feed the next chunk of response text.
+
+        Args:
+            text (str): The next chunk of the streamed response
+
+        Returns:
+            List[Any]: The array items completed by this chunk, in order
+        """
+        items = []
+        if self._done:
+            return items
+
+        item_start = 0 if self._depth > 1 or self._in_primitive else None
+
+        for index, char in enumerate(text):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0:
+                if char == "[":
+                    self._depth = 1
+                elif char == "{":
+                    self._done = True
+                    break
+                continue
+
+            if self._depth == 1 and self._in_primitive:
+                if char not in ",]":
+                    if char == '"':
+                        self._in_string = True
+                    continue
+                self._buffer.append(text[item_start:index])
+                items.append(self._parse_item("".join(self._buffer)))
+                self._buffer = []
+                self._in_primitive = False
+                item_start = None
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    item_start = index
+                    self._in_primitive = True
+            elif char in "{[":
+                if self._depth == 1:
+                    item_start = index
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and item_start is not None:
+                    self._buffer.append(text[item_start:index + 1])
+                    items.append(self._parse_item("".join(self._buffer)))
+                    self._buffer = []
+                    item_start = None
+                elif self._depth == 0:
+                    self._done = True
+                    break
+            elif self._depth == 1 and char != "," and char not in _WHITESPACE:
+                item_start = index
+                self._in_primitive = True
+
+        if item_start is not None:
+            self._buffer.append(text[item_start:])
+
+        return items
+
+    @staticmethod
+    def _parse_item(item_text: str) -> Any:
+        try:
+            return orjson.loads(item_text)
+        except orjson.JSONDecodeError as e:
+            logger.warning("Failed to parse streamed array item: %s", e)
+            return InvalidArrayItem(item_text.strip(), str(e))
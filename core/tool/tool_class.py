@@ -1,17 +1,127 @@
+import functools
+import re
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Union, Optional
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union, Optional
 
 
+# Basic email format: one "@" with a dotted domain and no whitespace
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class InputValidationError(ValueError):
+    """
+    Raised when tool input does not match the tool's input schema.
+    The message is the same error message validate_input_schema returns.
+    """
+
 class Tool(ABC):
     """
     Abstract base class for tools that can be used by agents.
     Each tool must implement the required methods for input validation and execution.
     """
     
+    # Number of distinct valid items remembered per tool, so re-validated items are skipped
+    _VALID_ITEM_CACHE_SIZE = 1024
+    
+    # Checker method for each schema field type; "array of X" types use the "array" checker
+    _TYPE_CHECKERS = {
+        "string": "_check_string",
+        "array": "_check_array",
+        "number": "_check_number",
+        "integer": "_check_number",
+        "boolean": "_check_boolean"
+    }
+    
     def __init__(self, name: str, description: str = "", input_schema: Optional[Dict] = None):
         self.name = name
         self.description = description
         self.input_schema = input_schema
+        self._tool_info: Optional[Dict[str, str]] = None
+        # input_schema is fixed after construction, so its prompt is generated only once
+        self._cached_schema_prompt: Optional[str] = None
+        self._compile_schema()
+    
+    def cached_schema_prompt(self) -> str:
+        """
+        Returns the tool's input schema prompt, generating it on first use.
+        Tools without an input_schema use their get_input_schema_prompt() instead.
+        
+        Returns:
+            str: The schema prompt for this tool
+        """
+        if self._cached_schema_prompt is None:
+            if self.input_schema is not None:
+                self._cached_schema_prompt = self._generate_dynamic_schema_prompt()
+            else:
+                self._cached_schema_prompt = self.get_input_schema_prompt()
+        return self._cached_schema_prompt
+    
+    def invalidate_schema_cache(self) -> None:
+        """
+        Discard everything derived from input_schema.
+        Call this after changing input_schema on an existing tool.
+        """
+        self._cached_schema_prompt = None
+        self._compile_schema()
+    
+    def _compile_schema(self) -> None:
+        """
+        Compile input_schema into the required field names and one checker per typed field,
+        so validating an item does no schema lookups or type dispatch.
+        """
+        self._required_fields: Tuple[str, ...] = ()
+        self._required_field_set: frozenset = frozenset()
+        self._compiled_validators: List[Tuple[str, Callable[[Any, int], Union[bool, str]]]] = []
+        # Keys of items that passed validation, least recently used first. Tools run
+        # in a thread pool, so access is locked.
+        self._valid_items: "OrderedDict[frozenset, None]" = OrderedDict()
+        self._valid_items_lock = threading.Lock()
+        if not isinstance(self.input_schema, dict):
+            return
+        
+        required_fields = []
+        for field_name, field_info in self.input_schema.items():
+            if isinstance(field_info, dict):
+                required = field_info.get('required', False)
+                if required:
+                    required_fields.append(field_name)
+                checker = self._compile_field_checker(field_name, field_info.get('type', 'string'), bool(required))
+            else:
+                # If field_info is not a dict, assume it's required and must not be empty
+                required_fields.append(field_name)
+                checker = functools.partial(self._check_not_empty, field_name=field_name)
+            
+            if checker is not None:
+                self._compiled_validators.append((field_name, checker))
+        
+        self._required_fields = tuple(required_fields)
+        self._required_field_set = frozenset(required_fields)
+    
+    def _compile_field_checker(self, field_name: str, field_type: str, required: bool) -> Optional[Callable[[Any, int], Union[bool, str]]]:
+        """
+        Get the checker for a field, bound to its name and required flag.
+        
+        Args:
+            field_name (str): The field name
+            field_type (str): The field type from the schema
+            required (bool): Whether empty values are rejected
+        
+        Returns:
+            Optional[Callable[[Any, int], Union[bool, str]]]: Function of (field_value, item_index),
+                or None when the type has no checks
+        """
+        if field_type.startswith("array of"):
+            field_type = "array"
+        checker_name = self._TYPE_CHECKERS.get(field_type)
+        if checker_name is None:
+            return None
+        
+        check = getattr(self, checker_name)
+        if field_type == "array":
+            return functools.partial(check, field_name=field_name, required=required, is_email="email" in field_name.lower())
+        return functools.partial(check, field_name=field_name, required=required)
     
     def get_input_schema_prompt(self) -> str:
         """
@@ -23,7 +133,7 @@ class Tool(ABC):
             str: A description of the input schema
         """
         if self.input_schema is not None:
-            return self._generate_dynamic_schema_prompt()
+            return self.cached_schema_prompt()
         else:
             return self._get_custom_input_schema_prompt()
     
@@ -44,46 +154,45 @@ class Tool(ABC):
         if not isinstance(self.input_schema, dict):
             return "Invalid input schema: self.input_schema must be a dictionary"
         
-        # Generate schema description
-        schema_lines = [
+        # Field definitions and an example item, each generated in one pass over input_schema
+        field_lines = (self._format_schema_field(field_name, field_info) for field_name, field_info in self.input_schema.items())
+        example_lines = (self._format_example_field(field_name, field_info) for field_name, field_info in self.input_schema.items())
+        
+        return "\n".join([
             f"{self.name} Input Schema:",
             "The input should be a list of dictionaries with the following fields:",
-            "["
-        ]
-        
-        # Add field definitions from input_schema
-        schema_lines.append("    {")
-        for field_name, field_info in self.input_schema.items():
-            if isinstance(field_info, dict):
-                field_type = field_info.get('type', 'string')
-                field_required = field_info.get('required', False)
-                field_description = field_info.get('description', '')
-                required_text = " (required)" if field_required else " (optional)"
-                schema_lines.append(f'        "{field_name}": "{field_type}{required_text} - {field_description}"')
-            else:
-                schema_lines.append(f'        "{field_name}": "{field_info}"')
-        
-        schema_lines.append("    }")
-        schema_lines.append("]")
-        
-        # Generate example based on schema
-        schema_lines.append("")
-        schema_lines.append("Example:")
-        schema_lines.append("[")
-        schema_lines.append("    {")
-        
-        for field_name, field_info in self.input_schema.items():
-            if isinstance(field_info, dict):
-                field_type = field_info.get('type', 'string')
-                example_value = self._get_example_value(field_name, field_type)
-                schema_lines.append(f'        "{field_name}": {example_value}')
-            else:
-                schema_lines.append(f'        "{field_name}": "example_value"')
-        
-        schema_lines.append("    }")
-        schema_lines.append("]")
-        
-        return "\n".join(schema_lines)
+            "[",
+            "    {",
+            *field_lines,
+            "    }",
+            "]",
+            "",
+            "Example:",
+            "[",
+            "    {",
+            *example_lines,
+            "    }",
+            "]"
+        ])
+    
+    def _format_schema_field(self, field_name: str, field_info: Any) -> str:
+        """
+        Format one field definition line of the schema prompt.
+        """
+        if isinstance(field_info, dict):
+            field_type = field_info.get('type', 'string')
+            required_text = " (required)" if field_info.get('required', False) else " (optional)"
+            field_description = field_info.get('description', '')
+            return f'        "{field_name}": "{field_type}{required_text} - {field_description}"'
+        return f'        "{field_name}": "{field_info}"'
+    
+    def _format_example_field(self, field_name: str, field_info: Any) -> str:
+        """
+        Format one field line of the schema prompt example.
+        """
+        if isinstance(field_info, dict):
+            return f'        "{field_name}": {self._get_example_value(field_name, field_info.get("type", "string"))}'
+        return f'        "{field_name}": "example_value"'
     
     def _get_example_value(self, field_name: str, field_type: str) -> str:
         """
@@ -154,91 +263,155 @@ class Tool(ABC):
             Union[bool, str]: True if validation passes, or error message
         """
         try:
-            # Check if input_data is a list
-            if not isinstance(input_data, list):
-                return "Input data must be a list of dictionaries"
-            
-            # Check if list is not empty
-            if not input_data:
-                return "Input data cannot be an empty list"
-            
-            # Get required fields from schema
-            required_fields = []
-            for field_name, field_info in self.input_schema.items():
-                if isinstance(field_info, dict) and field_info.get('required', False):
-                    required_fields.append(field_name)
-                elif not isinstance(field_info, dict):
-                    # If field_info is not a dict, assume it's required
-                    required_fields.append(field_name)
-            
-            # Validate each item in the list
-            for i, item in enumerate(input_data):
-                if not isinstance(item, dict):
-                    return f"Item at index {i} must be a dictionary"
-                
-                # Check required fields
-                for field in required_fields:
-                    if field not in item:
-                        return f"Item at index {i} is missing required field: {field}"
-                
-                # Validate each field according to schema
-                for field_name, field_info in self.input_schema.items():
-                    if field_name not in item:
-                        continue  # Skip optional fields that are not present
-                    
-                    field_value = item[field_name]
-                    
-                    if isinstance(field_info, dict):
-                        field_type = field_info.get('type', 'string')
-                        
-                        # Validate based on type
-                        validation_result = self._validate_field_type(
-                            field_value, field_type, field_name, i
-                        )
-                        if validation_result != True:
-                            return validation_result
-                    else:
-                        # If field_info is not a dict, do basic validation
-                        if not field_value and field_info.get('required', False) is True:
-                            return f"Item at index {i}: {field_name} cannot be empty"
-            
+            for _ in self.iter_validated_items(input_data):
+                pass
             return True
             
+        except InputValidationError as e:
+            return str(e)
         except (ValueError, TypeError, KeyError) as e:
             return f"Validation error: {str(e)}"
     
-    def _validate_field_type(self, field_value: Any, field_type: str, field_name: str, item_index: int) -> Union[bool, str]:
+    def iter_validated_items(self, input_data: Any) -> Iterator[Dict[str, Any]]:
         """
-        Validate a field value based on its expected type.
+        Validate input_data against the compiled schema one item at a time, yielding each
+        item once it has passed. Lets a tool process items in the same pass that validates them.
+        
+        Args:
+            input_data: The input data to validate
+            
+        Yields:
+            Dict[str, Any]: Each item, in order, after it has been validated
+            
+        Raises:
+            InputValidationError: If the input or an item does not match the schema
         """
-        if field_type == "string":
-            if not isinstance(field_value, str) or not field_value.strip() and self.input_schema.get(field_name, {}).get('required', False) is True:
-                return f"Item at index {item_index}: {field_name} must be a non-empty string"
+        # Check if input_data is a list
+        if not isinstance(input_data, list):
+            raise InputValidationError("Input data must be a list of dictionaries")
+        
+        # Check if list is not empty
+        if not input_data:
+            raise InputValidationError("Input data cannot be an empty list")
         
-        elif field_type == "array" or field_type.startswith("array of"):
-            if not isinstance(field_value, list):
-                return f"Item at index {item_index}: {field_name} must be a list"
+        # Validate each item in the list
+        for i, item in enumerate(input_data):
+            if not isinstance(item, dict):
+                raise InputValidationError(f"Item at index {i} must be a dictionary")
             
-            if not field_value and self.input_schema.get(field_name, {}).get('required', False) is True:  # Check if list is not empty
-                return f"Item at index {item_index}: {field_name} list cannot be empty"
+            # Items already seen to be valid, e.g. on a retry, are not checked again
+            item_key = self._get_item_key(item)
+            if item_key is not None:
+                with self._valid_items_lock:
+                    cached = item_key in self._valid_items
+                    if cached:
+                        self._valid_items.move_to_end(item_key)
+                if cached:
+                    yield item
+                    continue
             
-            # Validate array items
-            for j, item in enumerate(field_value):
-                if not isinstance(item, str) or not item.strip():
-                    return f"Item at index {item_index}, {field_name} at index {j}: must be a non-empty string"
-                
-                # Basic email format validation for email fields
-                if "email" in field_name.lower() and ("@" not in item or "." not in item.split("@")[-1]):
-                    return f"Item at index {item_index}, {field_name} at index {j}: invalid email format"
+            validation_result = self._validate_item(item, i)
+            if validation_result is not True:
+                raise InputValidationError(validation_result)
+            
+            if item_key is not None:
+                with self._valid_items_lock:
+                    self._valid_items[item_key] = None
+                    if len(self._valid_items) > self._VALID_ITEM_CACHE_SIZE:
+                        self._valid_items.popitem(last=False)
+            
+            yield item
+    
+    def _validate_item(self, item: Dict[str, Any], item_index: int) -> Union[bool, str]:
+        """
+        Validate one input item against the compiled schema.
         
-        elif field_type == "number" or field_type == "integer":
-            if not isinstance(field_value, (int, float)):
-                return f"Item at index {item_index}: {field_name} must be a number"
+        Args:
+            item (Dict[str, Any]): The item to validate
+            item_index (int): Position of the item, used in error messages
+            
+        Returns:
+            Union[bool, str]: True if validation passes, or error message
+        """
+        # Check required fields, reporting the first missing one in schema order
+        missing_fields = self._required_field_set.difference(item)
+        if missing_fields:
+            field = next(field for field in self._required_fields if field in missing_fields)
+            return f"Item at index {item_index} is missing required field: {field}"
         
-        elif field_type == "boolean":
-            if not isinstance(field_value, bool):
-                return f"Item at index {item_index}: {field_name} must be a boolean"
+        # Validate each field according to schema, skipping optional fields that are not present
+        for field_name, checker in self._compiled_validators:
+            if field_name in item:
+                validation_result = checker(item[field_name], item_index)
+                if validation_result is not True:
+                    return validation_result
+        
+        return True
+    
+    @staticmethod
+    def _get_item_key(item: Dict[str, Any]) -> Optional[frozenset]:
+        """
+        Get a hashable key for an item's contents, or None if it has unhashable values.
+        Value types are part of the key, so e.g. True and 1 are not confused.
+        """
+        try:
+            return frozenset(
+                (key, list, tuple((type(element), element) for element in value)) if isinstance(value, list) else (key, type(value), value)
+                for key, value in item.items()
+            )
+        except TypeError:
+            return None
+    
+    def _check_string(self, field_value: Any, item_index: int, field_name: str, required: bool) -> Union[bool, str]:
+        """
+        Check a string field; empty strings are rejected only for required fields.
+        """
+        if not isinstance(field_value, str) or not field_value.strip() and required:
+            return f"Item at index {item_index}: {field_name} must be a non-empty string"
+        return True
+    
+    def _check_array(self, field_value: Any, item_index: int, field_name: str, required: bool, is_email: bool = False) -> Union[bool, str]:
+        """
+        Check a list of non-empty strings, with basic email format checks for email fields.
+        """
+        if not isinstance(field_value, list):
+            return f"Item at index {item_index}: {field_name} must be a list"
+        
+        if not field_value and required:  # Check if list is not empty
+            return f"Item at index {item_index}: {field_name} list cannot be empty"
         
+        # Validate array items
+        for j, item in enumerate(field_value):
+            if not isinstance(item, str) or not item.strip():
+                return f"Item at index {item_index}, {field_name} at index {j}: must be a non-empty string"
+            
+            # Basic email format validation for email fields
+            if is_email and not EMAIL_RE.match(item):
+                return f"Item at index {item_index}, {field_name} at index {j}: invalid email format"
+        return True
+    
+    def _check_number(self, field_value: Any, item_index: int, field_name: str, required: bool) -> Union[bool, str]:
+        """
+        Check a number or integer field.
+        """
+        if not isinstance(field_value, (int, float)):
+            return f"Item at index {item_index}: {field_name} must be a number"
+        return True
+    
+    def _check_boolean(self, field_value: Any, item_index: int, field_name: str, required: bool) -> Union[bool, str]:
+        """
+        Check a boolean field.
+        """
+        if not isinstance(field_value, bool):
+            return f"Item at index {item_index}: {field_name} must be a boolean"
+        return True
+    
+    def _check_not_empty(self, field_value: Any, item_index: int, field_name: str) -> Union[bool, str]:
+        """
+        Check a field described only by a string, which must not be empty.
+        """
+        if not field_value:
+            return f"Item at index {item_index}: {field_name} cannot be empty"
         return True
     
     @abstractmethod
@@ -265,7 +438,9 @@ class Tool(ABC):
         Returns:
             Dict[str, str]: Dictionary containing tool name and description
         """
-        return {
-            "name": self.name,
-            "description": self.description
-        }
+        if self._tool_info is None:
+            self._tool_info = {
+                "name": self.name,
+                "description": self.description
+            }
+        return self._tool_info
@@ -1,16 +1,108 @@
+import asyncio
 import logging
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
 class Workflow:
-    def __init__(self, name: str, nodes: List[Any]):
-        self.nodes = nodes
+    def __init__(self, name: str, nodes: List[Any], dependencies: Optional[Dict[str, List[str]]] = None):
+        """
+        Initialize the workflow.
+        
+        Args:
+            name (str): The workflow name
+            nodes (List[Any]): The nodes to run, in order. Node names must be unique.
+            dependencies (Optional[Dict[str, List[str]]]): Map of node name to the names of the nodes
+                whose output it takes as input. If None, nodes run one after another, each taking the
+                previous node's output. If given, nodes whose dependencies have finished run concurrently.
+        """
         self.name = name
+        # Nodes keyed by name in run order, with the ordered list built lazily
+        self._nodes_by_name: Dict[str, Any] = {}
+        self._node_list: Optional[List[Any]] = None
+        for node in nodes:
+            self._add_node(node)
+        self.dependencies = dependencies
         self.global_context = ''
+        if self.dependencies is not None:
+            # Fail early on unknown nodes or cycles
+            self._get_levels()
         logger.info(f"Workflow {self.name} initialized with {len(self.nodes)} nodes")
     
+    @property
+    def nodes(self) -> List[Any]:
+        """The workflow's nodes in run order."""
+        if self._node_list is None:
+            self._node_list = list(self._nodes_by_name.values())
+        return self._node_list
+    
+    @nodes.setter
+    def nodes(self, nodes: List[Any]) -> None:
+        """Replace the workflow's nodes, keeping their order. Node names must be unique."""
+        self._nodes_by_name = {}
+        self._node_list = None
+        for node in nodes:
+            self._add_node(node)
+        if self.dependencies is not None:
+            self._get_levels()
+    
+    def _add_node(self, node: Any) -> None:
+        if node.name in self._nodes_by_name:
+            raise ValueError(f"Workflow {self.name} already has a node named {node.name}")
+        self._nodes_by_name[node.name] = node
+        self._node_list = None
+    
+    def _get_levels(self) -> List[List[Any]]:
+        """
+        Group the nodes into levels that only depend on nodes in earlier levels.
+        
+        Returns:
+            List[List[Any]]: The levels in run order, each keeping the workflow's node order
+        """
+        node_names = {node.name for node in self.nodes}
+        for node_name, dependency_names in self.dependencies.items():
+            unknown = [name for name in [node_name, *dependency_names] if name not in node_names]
+            if unknown:
+                raise ValueError(f"Workflow {self.name} dependencies reference unknown nodes: {unknown}")
+        
+        levels = []
+        done = set()
+        remaining = list(self.nodes)
+        while remaining:
+            level = [node for node in remaining if all(name in done for name in self.dependencies.get(node.name, []))]
+            if not level:
+                raise ValueError(f"Workflow {self.name} dependencies contain a cycle between: {[node.name for node in remaining]}")
+            levels.append(level)
+            done.update(node.name for node in level)
+            remaining = [node for node in remaining if node.name not in done]
+        return levels
+    
+    def _get_level_input(self, node: Any, prompt: str, outputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build a node's input from the outputs of the nodes it depends on.
+        
+        A node with one dependency takes that node's data as input; a node with several takes
+        a dict of their data keyed by node name.
+        
+        Args:
+            node (Any): The node to build the input for
+            prompt (str): The user prompt
+            outputs (Dict[str, Any]): The outputs of the nodes run so far, keyed by node name
+            
+        Returns:
+            Dict[str, Any]: The node input
+        """
+        dependency_names = self.dependencies.get(node.name, [])
+        if len(dependency_names) == 1:
+            input_data = outputs[dependency_names[0]]['data']
+        else:
+            input_data = {name: outputs[name]['data'] for name in dependency_names}
+        return { "User instructions": prompt, "Input": input_data } if input_data else { "User instructions": prompt }
+    
     async def run(self, prompt: str):
+        if self.dependencies is not None:
+            return await self._run_levels(prompt)
+        
         next_node_input = { 
             'data': {} 
         }
@@ -28,16 +120,152 @@ class Workflow:
 
         return next_node_input
 
+    async def _run_levels(self, prompt: str) -> Any:
+        """
+        Run the workflow as a dependency graph, running each level's nodes concurrently.
+        
+        Each node's input is built by _get_level_input. The workflow stops after the first
+        level with a failed node.
+        
+        Args:
+            prompt (str): The user prompt
+            
+        Returns:
+            Any: The output of the first failed node, or of the last node in the workflow
+        """
+        outputs: Dict[str, Any] = {}
+        
+        for level in self._get_levels():
+            node_inputs = [self._get_level_input(node, prompt, outputs) for node in level]
+            
+            results = await asyncio.gather(*(node.call(node_input) for node, node_input in zip(level, node_inputs)), return_exceptions=True)
+            
+            for node, result in zip(level, results):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                if isinstance(result, Exception):
+                    logger.error(f"Workflow {self.name} node {node.name} raised: {result}")
+                    result = { "success": False, "error": str(result) }
+                outputs[node.name] = result
+            
+            for node in level:
+                if outputs[node.name]['success'] is False:
+                    logger.error(f"Workflow {self.name} node {node.name} failed with input data: {outputs[node.name]}")
+                    return outputs[node.name]
+        
+        return outputs[self.nodes[-1].name] if self.nodes else { 'data': {} }
+
+    async def run_batch(self, prompts: List[str]) -> List[Any]:
+        """
+        Run the workflow for many prompts, batching each node across all prompts.
+        
+        Prompts whose node call fails stop progressing through the workflow and
+        keep the failed node output as their result. With dependencies, the nodes
+        run level by level as in run().
+        
+        Args:
+            prompts (List[str]): The user prompts to process
+            
+        Returns:
+            List[Any]: The final node output for each prompt, in order
+        """
+        if self.dependencies is not None:
+            return await self._run_levels_batch(prompts)
+        
+        results = [{ 'data': {} } for _ in prompts]
+        active = list(range(len(prompts)))
+
+        for node in self.nodes:
+            if not active:
+                break
+
+            node_inputs = [
+                { "User instructions": prompts[i], "Input": results[i]['data'] } if results[i]['data'] else { "User instructions": prompts[i] }
+                for i in active
+            ]
+            node_outputs = await node.call_batch(node_inputs)
+
+            still_active = []
+            for i, node_output in zip(active, node_outputs):
+                results[i] = node_output
+                if node_output['success'] is False:
+                    logger.error(f"Workflow {self.name} node {node.name} failed for prompt {i} with input data: {node_output}")
+                else:
+                    still_active.append(i)
+            active = still_active
+
+        return results
+
+    async def _run_levels_batch(self, prompts: List[str]) -> List[Any]:
+        """
+        Run the workflow as a dependency graph for many prompts, batching each node across
+        all prompts and running each level's nodes concurrently.
+        
+        Args:
+            prompts (List[str]): The user prompts to process
+            
+        Returns:
+            List[Any]: For each prompt, in order, the output of its first failed node, or of
+                the last node in the workflow
+        """
+        outputs: List[Dict[str, Any]] = [{} for _ in prompts]
+        results: List[Any] = [{ 'data': {} } for _ in prompts]
+        active = list(range(len(prompts)))
+        
+        for level in self._get_levels():
+            if not active:
+                break
+            
+            level_outputs = await asyncio.gather(
+                *(node.call_batch([self._get_level_input(node, prompts[i], outputs[i]) for i in active]) for node in level),
+                return_exceptions=True
+            )
+            
+            for node, node_outputs in zip(level, level_outputs):
+                if isinstance(node_outputs, asyncio.CancelledError):
+                    raise node_outputs
+                if isinstance(node_outputs, Exception):
+                    logger.error(f"Workflow {self.name} node {node.name} raised: {node_outputs}")
+                    node_outputs = [{ "success": False, "error": str(node_outputs) } for _ in active]
+                for i, node_output in zip(active, node_outputs):
+                    outputs[i][node.name] = node_output
+            
+            still_active = []
+            for i in active:
+                failed_node = next((node for node in level if outputs[i][node.name]['success'] is False), None)
+                if failed_node is not None:
+                    logger.error(f"Workflow {self.name} node {failed_node.name} failed for prompt {i} with input data: {outputs[i][failed_node.name]}")
+                    results[i] = outputs[i][failed_node.name]
+                else:
+                    still_active.append(i)
+            active = still_active
+        
+        if self.nodes:
+            for i in active:
+                results[i] = outputs[i][self.nodes[-1].name]
+        return results
+
     def add_node(self, node: Any):
-        self.nodes.append(node)
+        self._add_node(node)
         logger.info(f"Workflow {self.name} added node {node.name}")
     
     def remove_node(self, node: Any):
-        self.nodes.remove(node)
+        if self._nodes_by_name.get(node.name) is not node:
+            raise ValueError(f"Workflow {self.name} has no node {node.name}")
+        del self._nodes_by_name[node.name]
+        self._node_list = None
+        if self.dependencies is not None:
+            # Drop the node's own entry and every other node's dependency on it
+            self.dependencies = {
+                name: [dependency for dependency in dependency_names if dependency != node.name]
+                for name, dependency_names in self.dependencies.items()
+                if name != node.name
+            }
         logger.info(f"Workflow {self.name} removed node {node.name}")
     
     def get_next_node(self, index: int) -> Any:
         return self.nodes[index + 1]
     
     def get_nodes(self) -> List[Any]:
-        return self.nodes
\ No newline at end of file
+        # A copy, so changing the returned list cannot desync the workflow
+        return list(self._nodes_by_name.values())
\ No newline at end of file
@@ -1,9 +1,15 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Response, WebSocket, WebSocketDisconnect
+from contextlib import asynccontextmanager
+from typing import Any
+import asyncio
+import orjson
 import uvicorn
 import os
 import logging
 from dotenv import load_dotenv
+from core.llm.base_llm import BaseLLM
 from controller.simple_lead_generation import generate_leads_controller
+from controller import agent_controller, agent_tool_controller, llm_controller, simple_lead_generation
 from utils.websocket_validator import validate_websocket_message
 from routes import handle_websocket_message
 
@@ -21,12 +27,38 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Prime the shared connection pool so the first requests skip the TLS handshake
+    await asyncio.gather(
+        llm_controller.warmup(),
+        agent_controller.warmup(),
+        agent_tool_controller.warmup(),
+        simple_lead_generation.warmup()
+    )
+    logger.info("LLM connection warmup finished")
+    yield
+    # Release the pooled connections shared by all LLM instances
+    await BaseLLM.aclose()
+    logger.info("Shared LLM HTTP client closed")
+    await agent_tool_controller.close()
+    logger.info("Mail tool SMTP connection closed")
+
+app = FastAPI(lifespan=lifespan)
+
+def dumps_json(payload: Any) -> bytes:
+    """Serialize a response payload to compact JSON with orjson."""
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+
+async def send_websocket_json(websocket: WebSocket, payload: Any):
+    # Same compact text frame as websocket.send_json, serialized with orjson
+    await websocket.send_text(dumps_json(payload).decode())
 
 @app.post("/generate-leads")
 async def generate_leads(data: dict):
-    response = await generate_leads_controller(data['prompt'])
-    return response
+    # A list of prompts under 'prompts' is processed as one batch
+    response = await generate_leads_controller(data['prompts'] if 'prompts' in data else data['prompt'])
+    return Response(content=dumps_json(response), media_type="application/json")
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -35,22 +67,22 @@ async def websocket_endpoint(websocket: WebSocket):
     
     try:
         while True:
-            data = await websocket.receive_json()
-            logger.debug(f"Received WebSocket message: {data}")
+            data = orjson.loads(await websocket.receive_text())
+            logger.debug("Received WebSocket message: %s", data)
             
             # Validate the incoming message against our schema
             is_valid, validated_data, error = validate_websocket_message(data)
             
             if is_valid:
-                logger.info(f"Valid message received - Type: {validated_data.type}, Data: {validated_data.data}")
+                logger.info("Valid message received - Type: %s, Data: %s", validated_data.type, validated_data.data)
                 response = await handle_websocket_message(validated_data)
-                await websocket.send_json({
+                await send_websocket_json(websocket, {
                     "status": "success", 
                     "message": response
                 })
             else:
-                logger.warning(f"Invalid message received: {error}")
-                await websocket.send_json({
+                logger.warning("Invalid message received: %s", error)
+                await send_websocket_json(websocket, {
                     "status": "error", 
                     "message": "Invalid message format",
                     "error": error
@@ -61,7 +93,7 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error: {e}", exc_info=True)
         try:
-            await websocket.send_json({
+            await send_websocket_json(websocket, {
                 "status": "error", 
                 "message": "Internal server error",
                 "error": str(e)
@@ -1,25 +1,27 @@
 from controller.agent_tool_controller import test_agent_tool
 from controller.llm_controller import test_llm
 from controller.agent_controller import test_agent
-from typing import Dict, Any
+from typing import Any, Awaitable, Callable, Dict
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Handler for each WebSocket message type, called with the message data
+_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {
+    "llm_request": lambda data: test_llm(),
+    "agent_request": lambda data: test_agent(),
+    "agent_tool_request": lambda data: test_agent_tool(data['message'])
+}
+
 async def handle_websocket_message(requestData: Dict[str, Any]):
-    logger.info(f"Data: {requestData}")
+    logger.info("Data: %s", requestData)
 
     type = requestData.type
     data = requestData.data
     
-    logger.info(f"Handling WebSocket message: {type} with data: {data}")
+    logger.info("Handling WebSocket message: %s with data: %s", type, data)
     
-
-    if type == "llm_request":
-        return await test_llm()
-    elif type == "agent_request":
-        return await test_agent()
-    elif type == "agent_tool_request":
-        return await test_agent_tool(data['message'])
-    else:
-        return "Invalid type"
\ No newline at end of file
+    handler = _HANDLERS.get(type)
+    if handler is None:
+        return "Invalid type"
+    return await handler(data)
\ No newline at end of file
@@ -0,0 +1,57 @@
+import csv
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.export_leads_to_doc import ExportLeadsToDocTool
+
+
+def make_leads(index: int) -> list:
+    return [
+        {
+            "company_name": f"Company {index}-{n}",
+            "website": f"https://company{index}-{n}.example.com",
+            "location": "Berlin",
+            "company_description": f"Lead {n} of prompt {index}",
+            "email": [f"info@company{index}-{n}.example.com"]
+        }
+        for n in range(3)
+    ]
+
+
+class ConcurrentExportTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+    def _run_concurrently(self, export_format: str, count: int = 8) -> list:
+        tool = ExportLeadsToDocTool(export_format=export_format)
+        tool._export_dir = self._tmp.name
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            return list(pool.map(tool.run, [make_leads(index) for index in range(count)]))
+
+    def test_concurrent_exports_write_separate_files(self):
+        results = self._run_concurrently("csv")
+
+        self.assertTrue(all(result["success"] for result in results), results)
+        filepaths = [result["filepath"] for result in results]
+        self.assertEqual(len(set(filepaths)), len(filepaths))
+
+        # Each result must point at a file holding that call's own leads
+        for index, filepath in enumerate(filepaths):
+            with open(filepath, newline="", encoding="utf-8-sig") as csv_file:
+                rows = list(csv.DictReader(csv_file))
+            self.assertEqual([row["Company Name"] for row in rows], [lead["company_name"] for lead in make_leads(index)])
+
+    def test_concurrent_xlsx_exports_write_separate_files(self):
+        results = self._run_concurrently("xlsx")
+
+        self.assertTrue(all(result["success"] for result in results), results)
+        filepaths = {result["filepath"] for result in results}
+        self.assertEqual(len(filepaths), len(results))
+        self.assertEqual(len(os.listdir(self._tmp.name)), len(results))
+
+
+if __name__ == "__main__":
+    unittest.main()
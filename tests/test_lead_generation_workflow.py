@@ -0,0 +1,67 @@
+import asyncio
+import csv
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault("PERPLEXITY_API_KEY", "test-key")
+
+LEADS = [
+    {
+        "company_name": "Acme",
+        "company_description": "Makes anvils",
+        "location": "Berlin",
+        "website": "https://acme.example.com",
+        "linkedin_url": "https://linkedin.com/company/acme"
+    }
+]
+CONTACTS = [dict(LEADS[0], email=["info@acme.example.com"], phone_number=["+49 30 123456"])]
+
+
+def load_workflow_module(export_format: str):
+    with mock.patch.dict(os.environ, {"LEADS_EXPORT_FORMAT": export_format}):
+        if "workflows.lead_generation_workflow" in sys.modules:
+            return importlib.reload(sys.modules["workflows.lead_generation_workflow"])
+        return importlib.import_module("workflows.lead_generation_workflow")
+
+
+def respond_with(response):
+    async def query(instructions, prompt, history=None):
+        return {"status": "success", "response": response}
+    return query
+
+
+class LeadGenerationCsvExportTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.addCleanup(load_workflow_module, "xlsx")
+
+    def test_default_export_format_is_xlsx(self):
+        module = load_workflow_module("xlsx")
+
+        self.assertEqual(module.EmailAndPhoneNumberGeneratorAgent.next_node.export_format, "xlsx")
+
+    def test_workflow_exports_csv_when_configured(self):
+        module = load_workflow_module("csv")
+        module.LeadGenerationAgent.llm.query = respond_with(LEADS)
+        module.EmailAndPhoneNumberGeneratorAgent.llm.query = respond_with(CONTACTS)
+        module.EmailAndPhoneNumberGeneratorAgent.next_node._export_dir = self._tmp.name
+
+        result = asyncio.run(module.LeadGenerationWorkflow.run("Find anvil makers in Berlin"))
+
+        self.assertTrue(result["success"], result)
+        exports = os.listdir(self._tmp.name)
+        self.assertEqual(len(exports), 1)
+        self.assertTrue(exports[0].endswith(".csv"))
+        with open(os.path.join(self._tmp.name, exports[0]), newline="", encoding="utf-8-sig") as csv_file:
+            rows = list(csv.DictReader(csv_file))
+        self.assertEqual(rows[0]["Company Name"], "Acme")
+        self.assertEqual(rows[0]["Email Addresses"], "info@acme.example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from core.llm import cache as cache_module
+from core.llm.cache import LLMCache, get_llm_cache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+class LLMCacheTest(unittest.TestCase):
+    def test_hits_are_copies(self):
+        cache = LLMCache()
+        cache.set("model", "instructions", "prompt", {"status": "success", "response": [{"a": 1}]})
+
+        first = cache.get("model", "instructions", "prompt")
+        first["response"].append({"b": 2})
+
+        self.assertEqual(cache.get("model", "instructions", "prompt"), {"status": "success", "response": [{"a": 1}]})
+
+    def test_stored_response_is_a_copy(self):
+        cache = LLMCache()
+        response = {"status": "success", "response": {"a": 1}}
+        cache.set("model", "instructions", "prompt", response)
+
+        response["response"]["a"] = 2
+
+        self.assertEqual(cache.get("model", "instructions", "prompt"), {"status": "success", "response": {"a": 1}})
+
+    def test_redis_hit_is_a_copy(self):
+        cache = LLMCache()
+        cache._redis = FakeRedis()
+        asyncio.run(cache.aset("model", "instructions", "prompt", {"response": {"a": 1}}))
+        cache.clear()
+
+        first = asyncio.run(cache.aget("model", "instructions", "prompt"))
+        first["response"]["a"] = 2
+
+        self.assertEqual(asyncio.run(cache.aget("model", "instructions", "prompt")), {"response": {"a": 1}})
+
+    def test_shared_cache_reads_redis_url_on_first_use(self):
+        self.addCleanup(setattr, cache_module, "_llm_cache", cache_module._llm_cache)
+        cache_module._llm_cache = None
+
+        with mock.patch.dict(os.environ, {"LLM_CACHE_REDIS_URL": "redis://localhost:6379/0"}), \
+                mock.patch.object(cache_module, "LLMCache") as cache_class:
+            get_llm_cache()
+
+        cache_class.assert_called_once_with(redis_url="redis://localhost:6379/0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import smtplib
+import unittest
+from unittest import mock
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from core.agent.stateless_agent_class import StatelessAgent
+from tools.mail_sender_tool import MailSenderTool
+
+
+class FakeSMTP:
+    """Stand-in SMTP connection that records what it sends."""
+
+    connections = []
+
+    def __init__(self, host, port):
+        self.sent = []
+        self.refuse = set()
+        FakeSMTP.connections.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def send_message(self, msg, to_addrs):
+        refused = self.refuse.intersection(to_addrs)
+        if refused:
+            raise smtplib.SMTPRecipientsRefused({address: (550, b"refused") for address in refused})
+        self.sent.append(list(to_addrs))
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_email(to: str) -> dict:
+    return {"to": to, "subject": "Hello", "body": "Hi there"}
+
+
+class MailSenderBatchTest(unittest.TestCase):
+    def setUp(self):
+        FakeSMTP.connections = []
+        patcher = mock.patch("smtplib.SMTP", FakeSMTP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tool = MailSenderTool()
+        self.tool.username = "sender@example.com"
+        self.tool.password = "secret"
+
+    def test_run_sends_a_list_over_one_connection(self):
+        result = self.tool.run([make_email("a@example.com"), make_email("b@example.com")])
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["message"], "Sent 2 of 2 emails")
+        self.assertEqual(len(FakeSMTP.connections), 1)
+        self.assertEqual(FakeSMTP.connections[0].sent, [["a@example.com"], ["b@example.com"]])
+
+    def test_invalid_email_in_list_sends_nothing(self):
+        result = self.tool.run([make_email("a@example.com"), {"to": "b@example.com"}])
+
+        self.assertFalse(result["success"])
+        self.assertFalse(result["server_error"])
+        self.assertEqual(result["index"], 1)
+        self.assertEqual(FakeSMTP.connections, [])
+
+    def test_partly_sent_batch_is_not_retried(self):
+        self.tool.run(make_email("warmup@example.com"))
+        FakeSMTP.connections[0].refuse.add("b@example.com")
+
+        result = self.tool.run([make_email("a@example.com"), make_email("b@example.com")])
+
+        self.assertFalse(result["success"])
+        self.assertTrue(result["server_error"])
+        self.assertEqual(result["message"], "Sent 1 of 2 emails")
+
+    def test_empty_list_is_rejected(self):
+        result = self.tool.run([])
+
+        self.assertFalse(result["success"])
+        self.assertFalse(result["server_error"])
+        self.assertEqual(FakeSMTP.connections, [])
+
+
+class MailSenderAgentTest(unittest.TestCase):
+    def test_agent_instructions_include_mail_schema(self):
+        tool = MailSenderTool()
+        agent = StatelessAgent(name="Mailer", instructions="", llm_type="gemini", next_node=tool)
+
+        self.assertIn(tool.get_input_schema_prompt(), agent.instructions)
+        self.assertIn("pass a list of these dictionaries", agent.instructions)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import asyncio
+import unittest
+
+from core.llm.rate_limiter import AsyncTokenBucket, LoopSemaphore
+
+
+class AsyncTokenBucketTest(unittest.TestCase):
+    def test_bucket_works_across_event_loops(self):
+        # A capacity of one makes every burst wait on the lock
+        bucket = AsyncTokenBucket(rate_per_minute=6000, capacity=1)
+
+        async def burst():
+            await asyncio.gather(*(bucket.acquire() for _ in range(5)))
+
+        for _ in range(3):
+            asyncio.run(burst())
+
+
+class LoopSemaphoreTest(unittest.TestCase):
+    def test_semaphore_works_across_event_loops(self):
+        semaphore = LoopSemaphore(1)
+        in_flight = []
+
+        async def hold():
+            async with semaphore:
+                in_flight.append(1)
+                self.assertEqual(len(in_flight), 1)
+                await asyncio.sleep(0)
+                in_flight.pop()
+
+        async def burst():
+            await asyncio.gather(*(hold() for _ in range(5)))
+
+        for _ in range(3):
+            asyncio.run(burst())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+import asyncio
+import os
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from core.agent.stateless_agent_class import StatelessAgent
+from core.llm.base_llm import get_response_cache
+
+
+def make_agent(**kwargs) -> StatelessAgent:
+    return StatelessAgent(name="TestAgent", instructions="", llm_type="gemini", use_cache=False, **kwargs)
+
+
+class IncludeFieldsTest(unittest.TestCase):
+    def test_dotted_field_matches_inside_list_items(self):
+        agent = make_agent(include_fields=["Input.company_name"])
+        text = agent.before_call({"Input": [{"company_name": "Acme", "website": "acme.example"}]})
+
+        self.assertIn("company_name: Acme", text)
+        self.assertNotIn("website", text)
+
+    def test_dotted_field_does_not_match_its_key_elsewhere(self):
+        agent = make_agent(include_fields=["a.b"])
+        text = agent.before_call({"b": "top", "a": {"b": "nested"}, "c": {"b": "other"}})
+
+        self.assertEqual(text, "a:\n  b: nested")
+
+    def test_dotted_field_does_not_match_key_in_other_lists(self):
+        agent = make_agent(include_fields=["Input.company_name", "Other"])
+        text = agent.before_call({"Input": [{"company_name": "Acme"}], "Other": [{"company_name": "Hidden"}]})
+
+        self.assertIn("Acme", text)
+        self.assertNotIn("Hidden", text)
+
+    def test_bare_field_matches_at_any_depth(self):
+        agent = make_agent(include_fields=["Input", "company_name"])
+        text = agent.before_call({"Input": [{"company_name": "Acme", "location": "Berlin"}]})
+
+        self.assertIn("company_name: Acme", text)
+        self.assertNotIn("location", text)
+
+
+class RecordingTool:
+    """Stand-in workflow node that records the items it is run on."""
+
+    name = "RecordingTool"
+
+    def __init__(self, release: threading.Event = None):
+        self.items = []
+        self.release = release
+
+    def cached_schema_prompt(self) -> str:
+        return ""
+
+    def run(self, input_data):
+        if self.release is not None:
+            self.release.wait(5)
+        self.items.append(input_data)
+        return {"success": True, "response": input_data}
+
+
+def stream_of(*chunks, error: Exception = None):
+    async def query_stream(instructions, prompt, history=None):
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(0)
+        if error is not None:
+            raise error
+    return query_stream
+
+
+class StreamingTest(unittest.TestCase):
+    def test_array_items_are_streamed_to_the_tool(self):
+        tool = RecordingTool()
+        agent = make_agent(next_node=tool, process_as_array=True)
+        agent.llm.query_stream = stream_of('```json\n[{"a": 1},', ' {"a": 2}]\n```')
+
+        result = asyncio.run(agent.call("prompt"))
+
+        self.assertEqual(result, {"success": True, "data": [{"a": 1}, {"a": 2}]})
+
+    def test_top_level_object_is_passed_to_the_tool_whole(self):
+        tool = RecordingTool()
+        agent = make_agent(next_node=tool, process_as_array=True)
+        agent.llm.query_stream = stream_of('{"leads": [{"a": 1},', ' {"a": 2}]}')
+
+        result = asyncio.run(agent.call("prompt"))
+
+        self.assertEqual(tool.items, [{"leads": [{"a": 1}, {"a": 2}]}])
+        self.assertTrue(result["success"])
+
+    def test_invalid_item_is_regenerated_and_primitive_items_are_kept(self):
+        tool = RecordingTool()
+        agent = make_agent(next_node=tool, process_as_array=True)
+        agent.llm.query_stream = stream_of('[{"a": 1}, {bad}', ', 3, "x"]')
+        prompts = []
+
+        async def query(instructions, prompt, history=None):
+            prompts.append(prompt)
+            return {"status": "success", "response": [{"a": 2}]}
+
+        agent.llm.query = query
+        result = asyncio.run(agent.call("prompt"))
+
+        self.assertEqual(result, {"success": True, "data": [{"a": 1}, {"a": 2}, 3, "x"]})
+        self.assertEqual(len(prompts), 1)
+        self.assertIn("{bad}", prompts[0])
+        self.assertNotIn("{bad}", tool.items)
+
+    def test_stream_failure_cancels_pending_tool_calls(self):
+        # One tool thread blocks, so the queued calls behind it are still pending when the stream fails
+        release = threading.Event()
+        tool = RecordingTool(release)
+        agent = make_agent(next_node=tool, process_as_array=True)
+        agent._executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(agent._executor.shutdown)
+        agent.llm.query_stream = stream_of('[{"a": 1}, {"a": 2}, {"a": 3}', error=RuntimeError("stream broke"))
+
+        async def call():
+            result = await agent.call("prompt")
+            release.set()
+            return result
+
+        result = asyncio.run(call())
+        agent._executor.shutdown(wait=True)
+
+        self.assertEqual(result, {"success": False, "error": "stream broke"})
+        self.assertEqual(tool.items, [{"a": 1}])
+
+
+class TimeoutTest(unittest.TestCase):
+    def test_slow_llm_request_times_out(self):
+        agent = make_agent(next_node=RecordingTool(), timeout_s=0.05)
+
+        async def slow_query(instructions, prompt, history=None):
+            await asyncio.sleep(5)
+
+        agent.llm.query = slow_query
+        result = asyncio.run(agent.call("prompt"))
+
+        self.assertEqual(result, {"success": False, "error": "TestAgent LLM request timed out"})
+
+    def test_slow_tool_is_not_cut_off(self):
+        release = threading.Event()
+        tool = RecordingTool(release)
+        agent = make_agent(next_node=tool, timeout_s=0.05)
+
+        async def query(instructions, prompt, history=None):
+            return {"status": "success", "response": {"a": 1}}
+
+        async def call():
+            asyncio.get_running_loop().call_later(0.2, release.set)
+            return await agent.call("prompt")
+
+        agent.llm.query = query
+        result = asyncio.run(call())
+
+        self.assertEqual(result, {"success": True, "data": {"a": 1}})
+        self.assertEqual(tool.items, [{"a": 1}])
+
+
+class RejectingTool(RecordingTool):
+    """Stand-in workflow node that rejects inputs containing a "bad" key."""
+
+    def run(self, input_data):
+        self.items.append(input_data)
+        if "bad" in input_data:
+            return {"success": False, "error": "bad input"}
+        return {"success": True, "response": input_data}
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        self.addCleanup(get_response_cache().clear)
+
+    def _make_cached_agent(self, tool, responses):
+        agent = StatelessAgent(name="CachedAgent", instructions="", llm_type="gemini", next_node=tool)
+        prompts = []
+
+        async def query(instructions, prompt, history=None):
+            prompts.append(prompt)
+            return {"status": "success", "response": responses[min(len(prompts), len(responses)) - 1]}
+
+        agent.llm.query = query
+        return agent, prompts
+
+    def test_accepted_response_is_served_from_cache(self):
+        agent, prompts = self._make_cached_agent(RejectingTool(), [{"a": 1}])
+
+        first = asyncio.run(agent.call("prompt"))
+        second = asyncio.run(agent.call("prompt"))
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(prompts), 1)
+
+    def test_rejected_response_is_not_cached(self):
+        agent, prompts = self._make_cached_agent(RejectingTool(), [{"bad": 1}, {"a": 1}])
+
+        asyncio.run(agent.call("prompt"))
+        asyncio.run(agent.call("prompt"))
+
+        # Both calls start with a fresh query instead of replaying the rejected response
+        self.assertEqual(prompts[0], "prompt")
+        self.assertEqual(prompts[2], "prompt")
+
+    def test_accepted_streamed_response_is_served_from_cache(self):
+        tool = RecordingTool()
+        agent = StatelessAgent(name="CachedAgent", instructions="", llm_type="gemini", next_node=tool, process_as_array=True)
+        streams = []
+
+        async def query_stream(instructions, prompt, history=None):
+            streams.append(prompt)
+            yield '[{"a": 1}, {"a": 2}]'
+
+        agent.llm.query_stream = query_stream
+        first = asyncio.run(agent.call("prompt"))
+        second = asyncio.run(agent.call("prompt"))
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(streams), 1)
+        self.assertEqual(tool.items, [{"a": 1}, {"a": 2}, {"a": 1}, {"a": 2}])
+
+    def test_rejected_streamed_response_is_not_cached(self):
+        agent = StatelessAgent(name="CachedAgent", instructions="", llm_type="gemini", next_node=RejectingTool(), process_as_array=True)
+        agent.llm.query_stream = stream_of('[{"a": 1}, {"bad": 1}]')
+
+        async def query(instructions, prompt, history=None):
+            return {"status": "success", "response": [{"a": 2}]}
+
+        agent.llm.query = query
+        asyncio.run(agent.call("prompt"))
+
+        self.assertIsNone(get_response_cache().get(agent.llm.model, agent.instructions, "prompt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from core.tool.tool_class import Tool
+
+
+class CustomSchemaTool(Tool):
+    """Tool without an input_schema that describes its input itself."""
+
+    def __init__(self):
+        super().__init__(name="custom")
+
+    def _get_custom_input_schema_prompt(self) -> str:
+        return "custom Input Schema: a single string"
+
+    def run(self, input_data):
+        return {"success": True, "response": input_data}
+
+
+class SchemaTool(CustomSchemaTool):
+    def __init__(self):
+        Tool.__init__(self, name="schema", input_schema={"name": {"type": "string", "required": True}})
+
+
+class SchemaPromptTest(unittest.TestCase):
+    def test_tool_without_schema_uses_its_own_prompt(self):
+        self.assertEqual(CustomSchemaTool().cached_schema_prompt(), "custom Input Schema: a single string")
+
+    def test_tool_with_schema_uses_generated_prompt(self):
+        prompt = SchemaTool().cached_schema_prompt()
+
+        self.assertTrue(prompt.startswith("schema Input Schema:"))
+        self.assertIn('"name": "string (required)', prompt)
+
+
+class ValidationTest(unittest.TestCase):
+    def test_input_fixed_in_place_is_validated_again(self):
+        tool = SchemaTool()
+        leads = [{"name": ""}]
+        self.assertNotEqual(tool.validate_input_schema(leads), True)
+
+        leads[0]["name"] = "Acme"
+
+        self.assertIs(tool.validate_input_schema(leads), True)
+
+
+if __name__ == "__main__":
+    unittest.main()
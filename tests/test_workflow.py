@@ -0,0 +1,69 @@
+import asyncio
+import unittest
+
+from core.workflow.workflow_class import Workflow
+
+
+class EchoNode:
+    """Stand-in workflow node that echoes its input, failing for prompts containing fail_on."""
+
+    def __init__(self, name: str, fail_on: str = None):
+        self.name = name
+        self.fail_on = fail_on
+
+    async def call(self, node_input):
+        if self.fail_on is not None and self.fail_on in node_input["User instructions"]:
+            return {"success": False, "error": f"{self.name} failed"}
+        return {"success": True, "data": {self.name: node_input.get("Input")}}
+
+    async def call_batch(self, node_inputs):
+        return await asyncio.gather(*(self.call(node_input) for node_input in node_inputs))
+
+
+def make_workflow():
+    nodes = [EchoNode("a"), EchoNode("b", fail_on="bad"), EchoNode("c")]
+    return Workflow("test", nodes, dependencies={"c": ["a", "b"]})
+
+
+class WorkflowBatchTest(unittest.TestCase):
+    def test_run_batch_matches_run_with_dependencies(self):
+        prompts = ["first", "bad prompt", "second"]
+
+        async def run_all():
+            workflow = make_workflow()
+            return [await workflow.run(prompt) for prompt in prompts], await workflow.run_batch(prompts)
+
+        single, batch = asyncio.run(run_all())
+
+        self.assertEqual(batch, single)
+        self.assertEqual(batch[0], {"success": True, "data": {"c": {"a": {"a": None}, "b": {"b": None}}}})
+        self.assertEqual(batch[1], {"success": False, "error": "b failed"})
+
+
+class WorkflowRemoveNodeTest(unittest.TestCase):
+    def test_remove_node_drops_dependencies_on_it(self):
+        workflow = make_workflow()
+        workflow.remove_node(workflow.nodes[1])
+
+        self.assertEqual(workflow.dependencies, {"c": ["a"]})
+        result = asyncio.run(workflow.run("prompt"))
+        self.assertEqual(result, {"success": True, "data": {"c": {"a": None}}})
+
+
+class WorkflowNodesTest(unittest.TestCase):
+    def test_nodes_can_be_replaced(self):
+        workflow = Workflow("test", [EchoNode("a")])
+        workflow.nodes = [EchoNode("x"), EchoNode("y")]
+
+        self.assertEqual([node.name for node in workflow.nodes], ["x", "y"])
+        self.assertEqual(asyncio.run(workflow.run("prompt")), {"success": True, "data": {"y": {"x": None}}})
+
+    def test_get_nodes_returns_a_copy(self):
+        workflow = Workflow("test", [EchoNode("a"), EchoNode("b")])
+        workflow.get_nodes().pop()
+
+        self.assertEqual([node.name for node in workflow.nodes], ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
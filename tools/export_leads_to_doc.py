@@ -1,11 +1,49 @@
-from typing import Any
-import pandas as pd
+from typing import Any, Iterator, List
+import csv
 import os
 from datetime import datetime
-from core.tool.tool_class import Tool
+from uuid import uuid4
+import xlsxwriter
+from xlsxwriter.exceptions import XlsxWriterException
+from core.tool.tool_class import InputValidationError, Tool
+
+# Cell format properties for the exported sheet; registered on each new workbook
+HEADER_FORMAT = {
+    'bold': True,
+    'font_color': '#FFFFFF',
+    'font_size': 12,
+    'bg_color': '#366092',
+    'align': 'center',
+    'valign': 'vcenter',
+    'text_wrap': True,
+    'border': 1
+}
+DATA_FORMAT = {
+    'font_size': 10,
+    'align': 'left',
+    'valign': 'top',
+    'text_wrap': True,
+    'border': 1
+}
+
+# Supported export formats, by file extension, with the name used in messages
+EXPORT_FORMATS = {
+    "xlsx": "Excel",
+    "csv": "CSV"
+}
 
 class ExportLeadsToDocTool(Tool):
-    def __init__(self):
+    def __init__(self, export_format: str = "xlsx"):
+        """
+        Initialize the export tool.
+        
+        Args:
+            export_format (str): File format to export to, "xlsx" (formatted Excel sheet) or
+                "csv" (plain UTF-8 CSV, much faster to write for large lead sets)
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}. Supported formats: {', '.join(EXPORT_FORMATS)}")
+        
         input_schema = {
             "company_name": {
                 "type": "string",
@@ -43,7 +81,16 @@ class ExportLeadsToDocTool(Tool):
                 "description": "Employees whose roles and designation that comes in input their email and phone number"
             }
         }
-        super().__init__(name="ExportLeadsToDocTool", description="Export leads to an Excel file.", input_schema=input_schema)
+        description = "Export leads to an Excel file." if export_format == "xlsx" else f"Export leads to a {EXPORT_FORMATS[export_format]} file."
+        super().__init__(name="ExportLeadsToDocTool", description=description, input_schema=input_schema)
+        self.export_format = export_format
+        
+        # Exports go to an "exports" directory under the working directory the tool was created in
+        self._export_dir = os.path.abspath("exports")
+        
+        # Column order and header names are fixed by the schema
+        self._columns = list(self.input_schema.keys())
+        self._display_names = {field_name: self._get_display_name(field_name) for field_name in self._columns}
 
     def _get_display_name(self, field_name: str) -> str:
         """
@@ -65,9 +112,63 @@ class ExportLeadsToDocTool(Tool):
         
         return field_mappings.get(field_name, display_name)
     
+    @staticmethod
+    def _format_cell(field_value: Any) -> str:
+        """
+        Convert a field value to its cell text.
+        Array fields are joined with line breaks for better readability.
+        """
+        if isinstance(field_value, list):
+            return "\n".join(map(str, field_value))
+        return "" if field_value is None else str(field_value)
+    
+    def _iter_rows(self, input_data: List[dict], columns: List[str]) -> Iterator[List[str]]:
+        """
+        Yield the cell texts of each lead for the given columns.
+        """
+        for lead in input_data:
+            yield [self._format_cell(lead.get(field_name)) for field_name in columns]
+    
+    def _write_xlsx(self, filepath: str, headers: List[str], rows: Iterator[List[str]]) -> None:
+        """
+        Write a formatted Excel sheet with auto-sized columns.
+        """
+        max_lengths = [len(header) for header in headers]
+        
+        # Write rows straight to the file; constant_memory flushes each row once the next one starts.
+        # strings_to_urls is off so website cells stay plain text instead of being regex-matched into links.
+        with xlsxwriter.Workbook(filepath, {'constant_memory': True, 'strings_to_urls': False}) as workbook:
+            worksheet = workbook.add_worksheet('Leads')
+            
+            # Header and data cell formats, each registered once and shared by all cells
+            header_format = workbook.add_format(HEADER_FORMAT)
+            data_format = workbook.add_format(DATA_FORMAT)
+            
+            # Write the header and the data rows, with a row height of 20 for better readability
+            worksheet.set_row(0, 20)
+            worksheet.write_row(0, 0, headers, header_format)
+            for row_index, row in enumerate(rows, start=1):
+                max_lengths = list(map(max, max_lengths, map(len, row)))
+                worksheet.set_row(row_index, 20)
+                worksheet.write_row(row_index, 0, row, data_format)
+            
+            # Auto-adjust column widths based on maximum content length, header included
+            # Minimum width of 10, maximum of 80, add 3 characters for padding
+            for column_index, max_length in enumerate(max_lengths):
+                worksheet.set_column(column_index, column_index, max(10, min(max_length + 3, 80)))
+    
+    def _write_csv(self, filepath: str, headers: List[str], rows: Iterator[List[str]]) -> None:
+        """
+        Write a CSV file; the UTF-8 BOM lets Excel detect the encoding when opening it.
+        """
+        with open(filepath, "w", newline="", encoding="utf-8-sig") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(headers)
+            writer.writerows(rows)
+    
     def run(self, input_data: Any) -> Any:
         """
-        Export leads data to an Excel file and save it to the local system.
+        Export leads data to a file in the tool's export format and save it to the local system.
         
         Args:
             input_data: List of lead dictionaries containing company information
@@ -76,135 +177,44 @@ class ExportLeadsToDocTool(Tool):
             Dictionary with success status and file path information
         """
         try:
-            # Validate input data first
-            validation_result = self.validate_input_schema(input_data)
-            if validation_result != True:
+            # Validate input data first, noting which fields the leads have in the same pass
+            present_fields = set()
+            try:
+                for lead in self.iter_validated_items(input_data):
+                    present_fields.update(lead)
+            except InputValidationError as e:
                 return {
                     "success": False,
                     "server_error": False,
-                    "error": f"Input validation failed: {validation_result}"
+                    "error": f"Input validation failed: {e}"
                 }
             
             # Create a directory for exports if it doesn't exist
-            export_dir = "exports"
-            if not os.path.exists(export_dir):
-                os.makedirs(export_dir)
-            
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"leads_export_{timestamp}.xlsx"
-            filepath = os.path.join(export_dir, filename)
-            
-            # Prepare data for Excel export dynamically based on schema
-            excel_data = []
-            for lead in input_data:
-                excel_row = {}
-                
-                for field_name in self.input_schema.keys():
-                    if field_name in lead:
-                        field_value = lead[field_name]
-                        
-                        # Handle array fields by joining with line breaks for better readability
-                        if isinstance(field_value, list):
-                            if field_value:  # Only process non-empty lists
-                                display_value = "\n".join(str(item) for item in field_value)
-                            else:
-                                display_value = ""  # Empty list shows as empty string
-                        else:
-                            display_value = str(field_value) if field_value is not None else ""
-                        
-                        # Create a nice display name for the column
-                        display_name = self._get_display_name(field_name)
-                        excel_row[display_name] = display_value
-                
-                excel_data.append(excel_row)
+            os.makedirs(self._export_dir, exist_ok=True)
             
-            # Create DataFrame and export to Excel
-            df = pd.DataFrame(excel_data)
+            # Generate filename with timestamp; the random suffix keeps exports started in the same second apart
+            filename = f"leads_export_{datetime.now():%Y%m%d_%H%M%S}_{uuid4().hex[:8]}.{self.export_format}"
+            filepath = os.path.join(self._export_dir, filename)
             
-            # Export to Excel with formatting
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Leads', index=False)
-                
-                # Get the worksheet for formatting
-                worksheet = writer.sheets['Leads']
-                
-                # Auto-adjust column widths based on maximum content length
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    
-                    # Check header length first
-                    header_cell = worksheet[f"{column_letter}1"]
-                    if header_cell.value:
-                        max_length = len(str(header_cell.value))
-                    
-                    # Check all data cells in the column
-                    for cell in column[1:]:  # Skip header row
-                        try:
-                            if cell.value is not None:
-                                cell_length = len(str(cell.value))
-                                if cell_length > max_length:
-                                    max_length = cell_length
-                        except (TypeError, AttributeError):
-                            pass
-                    
-                    # Set width with padding and reasonable limits
-                    # Minimum width of 10, maximum of 80, add 3 characters for padding
-                    adjusted_width = max(10, min(max_length + 3, 80))
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-                
-                # Add comprehensive formatting for better readability
-                from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-                
-                # Header formatting
-                header_font = Font(bold=True, color="FFFFFF", size=12)
-                header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-                header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-                
-                # Data cell formatting
-                data_font = Font(size=10)
-                data_alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-                
-                # Border styling
-                thin_border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-                
-                # Apply header formatting
-                for cell in worksheet[1]:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = header_alignment
-                    cell.border = thin_border
-                
-                # Apply data formatting to all data rows
-                for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row):
-                    for cell in row:
-                        cell.font = data_font
-                        cell.alignment = data_alignment
-                        cell.border = thin_border
-                
-                # Set row height for better readability
-                for row in range(1, worksheet.max_row + 1):
-                    worksheet.row_dimensions[row].height = 20
+            # Leave out fields that no lead has, and use nice display names for the columns
+            columns = [field_name for field_name in self._columns if field_name in present_fields]
+            headers = [self._display_names[field_name] for field_name in columns]
             
-            # Get absolute file path
-            absolute_filepath = os.path.abspath(filepath)
+            if self.export_format == "csv":
+                self._write_csv(filepath, headers, self._iter_rows(input_data, columns))
+            else:
+                self._write_xlsx(filepath, headers, self._iter_rows(input_data, columns))
             
             return {
                 "success": True,
-                "message": f"Successfully exported {len(input_data)} leads to Excel file",
-                "filepath": absolute_filepath,
+                "message": f"Successfully exported {len(input_data)} leads to {EXPORT_FORMATS[self.export_format]} file",
+                "filepath": filepath,
                 "filename": filename,
                 "total_leads": len(input_data)
             }
             
-        except (ValueError, TypeError, KeyError, OSError, PermissionError) as e:
+        except (ValueError, TypeError, KeyError, OSError, PermissionError, XlsxWriterException) as e:
             return {
                 "success": False,
-                "error": f"Failed to export leads to Excel: {str(e)}"
+                "error": f"Failed to export leads to {EXPORT_FORMATS[self.export_format]}: {str(e)}"
             }
\ No newline at end of file
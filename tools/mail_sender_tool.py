@@ -1,38 +1,23 @@
 import logging
-from typing import Any, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 import smtplib
+import threading
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.utils import parseaddr
 import os
-from core.tool.tool_class import Tool
+from core.tool.tool_class import EMAIL_RE, Tool
 
 logger = logging.getLogger(__name__)
 
+# Fields every message must have, in the order they are reported when missing
+_REQUIRED_FIELDS = ('subject', 'body')
+_REQUIRED_FIELD_SET = frozenset(_REQUIRED_FIELDS)
 
-class MailSenderTool(Tool):
-    """
-    A tool for sending emails using SMTP.
-    """
-    
-    def __init__(self):
-        super().__init__(
-            name="mail_sender",
-            description="Sends emails using SMTP with configurable server settings"
-        )
-        self.name = "mail_sender"
-        self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-        self.smtp_port = int(os.getenv('SMTP_PORT', '587'))
-        self.username = os.getenv('SMTP_USERNAME', '')
-        self.password = os.getenv('SMTP_PASSWORD', '')
-    
-    def get_input_schema_prompt(self) -> str:
-        """
-        Returns a string prompt describing the expected input schema for the mail sender tool.
-        
-        Returns:
-            str: A description of the input schema
-        """
-        return """
+# Fields holding lists of recipient addresses
+_ADDRESS_LIST_FIELDS = ('to_list', 'cc', 'bcc')
+
+# Input schema description; included in validation errors, so built once at import
+_SCHEMA_PROMPT = """
 Mail Sender Tool Input Schema:
 The input should be a dictionary with the following required fields:
 - 'to': str - Recipient email address
@@ -53,12 +38,45 @@ Example:
     "is_html": False
 }
 
+To send several emails at once, pass a list of these dictionaries instead.
+
 Environment variables required:
 - SMTP_SERVER: SMTP server address (default: smtp.gmail.com)
 - SMTP_PORT: SMTP server port (default: 587)
 - SMTP_USERNAME: SMTP username/email
 - SMTP_PASSWORD: SMTP password or app password
         """
+
+
+class MailSenderTool(Tool):
+    """
+    A tool for sending emails using SMTP.
+    """
+    
+    def __init__(self):
+        super().__init__(
+            name="mail_sender",
+            description="Sends emails using SMTP with configurable server settings"
+        )
+        self.name = "mail_sender"
+        self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+        self.smtp_port = int(os.getenv('SMTP_PORT', '587'))
+        self.username = os.getenv('SMTP_USERNAME', '')
+        self.password = os.getenv('SMTP_PASSWORD', '')
+        # One logged-in SMTP connection reused across sends. Tools run in a thread
+        # pool, so the connection is only used while holding the lock. It is reentrant
+        # so a batch can hold it across all of its sends.
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_lock = threading.RLock()
+    
+    def get_input_schema_prompt(self) -> str:
+        """
+        Returns a string prompt describing the expected input schema for the mail sender tool.
+        
+        Returns:
+            str: A description of the input schema
+        """
+        return _SCHEMA_PROMPT
     
     def validate_input_schema(self, input_data: Any) -> Union[bool, str]:
         """
@@ -78,13 +96,11 @@ Environment variables required:
                 "error": f"Input must be a dictionary. Current input type: {type(input_data).__name__} {input_data}"
             }
         
-        # Check for required fields
-        required_fields = ['subject', 'body']
-        missing_fields = []
-        
-        for field in required_fields:
-            if field not in input_data:
-                missing_fields.append(field)
+        # Check for required fields; the common case where all are present is one set check
+        if _REQUIRED_FIELD_SET.issubset(input_data):
+            missing_fields = []
+        else:
+            missing_fields = [field for field in _REQUIRED_FIELDS if field not in input_data]
         
         # Check that either 'to' or 'to_list' is provided
         if 'to' not in input_data and 'to_list' not in input_data:
@@ -94,7 +110,7 @@ Environment variables required:
             return {
                 "success": False,
                 "server_error": False,
-                "error": f"Missing required fields: {', '.join(missing_fields)}. {self.get_input_schema_prompt()}"
+                "error": f"Missing required fields: {', '.join(missing_fields)}. {_SCHEMA_PROMPT}"
             }
         
         # Validate field types
@@ -148,12 +164,25 @@ Environment variables required:
                 "error": f"Field 'is_html' must be a boolean. Current type: {type(input_data['is_html']).__name__}"
             }
         
+        # Validate recipient address formats; display-name forms like "Name <a@b.com>" are accepted
+        for field in ('to', *_ADDRESS_LIST_FIELDS):
+            if field not in input_data:
+                continue
+            addresses = [input_data[field]] if field == 'to' else input_data[field]
+            for address in addresses:
+                if not isinstance(address, str) or not EMAIL_RE.match(parseaddr(address)[1]):
+                    return {
+                        "success": False,
+                        "server_error": False,
+                        "error": f"Field '{field}' contains an invalid email address: {address!r}"
+                    }
+        
         # Check if SMTP credentials are configured
         if not self.username or not self.password:
             return {
                 "success": False,
                 "server_error": True,
-                "error": f"SMTP credentials not configured. Please set SMTP_USERNAME and SMTP_PASSWORD environment variables. {self.get_input_schema_prompt()}"
+                "error": f"SMTP credentials not configured. Please set SMTP_USERNAME and SMTP_PASSWORD environment variables. {_SCHEMA_PROMPT}"
             }
         
         return {
@@ -162,67 +191,126 @@ Environment variables required:
             "error": None
         }
     
-    def run(self, input_data: Any) -> Any:
+    def _connect(self) -> smtplib.SMTP:
         """
-        Executes the mail sender tool with the provided input data.
+        Get the pooled SMTP connection, opening and logging in a new one if there is none.
+        Must be called while holding the SMTP lock.
+        
+        Returns:
+            smtplib.SMTP: A logged-in SMTP connection
+        """
+        if self._smtp is None:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+            try:
+                server.starttls()
+                server.login(self.username, self.password)
+            except Exception:
+                server.close()
+                raise
+            self._smtp = server
+            logger.info(f"{self.name} opened SMTP connection to {self.smtp_server}:{self.smtp_port}")
+        return self._smtp
+    
+    def _send(self, msg: MIMEText, recipients: List[str]) -> None:
+        """
+        Send a message over the pooled SMTP connection, reconnecting once if the
+        server has closed it since the last send.
+        
+        Args:
+            msg (MIMEText): The message to send
+            recipients (List[str]): All envelope recipients, including CC and BCC
+        """
+        with self._smtp_lock:
+            try:
+                try:
+                    self._connect().send_message(msg, to_addrs=recipients)
+                except smtplib.SMTPServerDisconnected:
+                    logger.info(f"{self.name} SMTP connection was closed by the server, reconnecting")
+                    self.close()
+                    self._connect().send_message(msg, to_addrs=recipients)
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # The server rejected this message; the connection itself is still usable
+                raise
+            except (smtplib.SMTPException, OSError):
+                # The connection state is unknown after other failures, so start fresh next time
+                self.close()
+                raise
+    
+    def close(self) -> None:
+        """
+        Close the pooled SMTP connection, if any.
+        Call this on application shutdown; a later send reconnects.
+        """
+        with self._smtp_lock:
+            server, self._smtp = self._smtp, None
+            if server is not None:
+                try:
+                    server.quit()
+                except (smtplib.SMTPException, OSError):
+                    server.close()
+    
+    def _address_lists(self, input_data: Dict[str, Any]) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Get the To, CC and BCC address lists for validated input data.
+        A single 'to' address takes precedence over 'to_list'.
+        """
+        to_list = [input_data['to']] if 'to' in input_data else input_data['to_list']
+        return to_list, input_data.get('cc', []), input_data.get('bcc', [])
+    
+    def _build_mime(self, input_data: Dict[str, Any]) -> MIMEText:
+        """
+        Build the email message for validated input data.
+        The body is the only part, so it is sent as a single text part, not multipart.
         
         Args:
-            input_data: The input data containing email details
+            input_data (Dict[str, Any]): The email details
             
         Returns:
-            Dict: Result of the email sending operation
+            MIMEText: The message with its headers and body
         """
-        try:
-            logger.info(f"{self.name} is running with input data: {input_data}")
-
-            # Validate input first
-            validation_result = self.validate_input_schema(input_data)
-            if validation_result['success'] is False:
-                logger.info(f"{self.name} input data validation failed: {validation_result}")
-                return {
-                "success": False,
-                "server_error": False,
-                "error": validation_result
-            }
-
-            logger.info(f"{self.name} input data validated successfully")
-            
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.username
-            
-            # Handle recipients
-            if 'to' in input_data:
-                msg['To'] = input_data['to']
-                recipients = [input_data['to']]
-            else:
-                msg['To'] = ', '.join(input_data['to_list'])
-                recipients = input_data['to_list']
-            
-            # Add CC and BCC
-            if 'cc' in input_data:
-                msg['Cc'] = ', '.join(input_data['cc'])
-                recipients.extend(input_data['cc'])
-            
-            if 'bcc' in input_data:
-                recipients.extend(input_data['bcc'])
+        to_list, cc_list, _ = self._address_lists(input_data)
+        
+        msg = MIMEText(input_data['body'], 'html' if input_data.get('is_html', False) else 'plain')
+        msg['From'] = self.username
+        msg['To'] = ', '.join(to_list)
+        if cc_list:
+            msg['Cc'] = ', '.join(cc_list)
+        
+        msg['Subject'] = input_data['subject']
+        
+        return msg
+    
+    def _recipients(self, input_data: Dict[str, Any]) -> List[str]:
+        """
+        Get all envelope recipients for validated input data: To, CC and BCC.
+        
+        Args:
+            input_data (Dict[str, Any]): The email details
             
-            msg['Subject'] = input_data['subject']
+        Returns:
+            List[str]: The recipient addresses
+        """
+        to_list, cc_list, bcc_list = self._address_lists(input_data)
+        return to_list + cc_list + bcc_list
+    
+    def _send_one(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build and send one email from validated input data.
+        
+        Args:
+            input_data (Dict[str, Any]): The email details
             
-            # Add body
-            is_html = input_data.get('is_html', False)
-            if is_html:
-                msg.attach(MIMEText(input_data['body'], 'html'))
-            else:
-                msg.attach(MIMEText(input_data['body'], 'plain'))
+        Returns:
+            Dict[str, Any]: Result of the email sending operation
+        """
+        try:
+            msg = self._build_mime(input_data)
+            recipients = self._recipients(input_data)
             
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.username, self.password)
-                server.send_message(msg, to_addrs=recipients)
+            # Send email over the pooled connection
+            self._send(msg, recipients)
             
-            logger.info(f"{self.name} sent email successfully to {len(recipients)} recipient(s)")
+            logger.info("%s sent email successfully to %s recipient(s)", self.name, len(recipients))
             
             return {
                 "success": True,
@@ -254,3 +342,86 @@ Environment variables required:
                 "success": False,
                 "error": f"Input validation error: {str(e)}"
             }
+    
+    def run(self, input_data: Any) -> Any:
+        """
+        Executes the mail sender tool with the provided input data.
+        A list of emails is sent with run_batch.
+        
+        Args:
+            input_data: The input data containing email details, or a list of them
+            
+        Returns:
+            Dict: Result of the email sending operation
+        """
+        if isinstance(input_data, list):
+            return self.run_batch(input_data)
+        
+        logger.info("%s is running with input data: %s", self.name, input_data)
+
+        # Validate input first
+        validation_result = self.validate_input_schema(input_data)
+        if validation_result['success'] is False:
+            logger.info("%s input data validation failed: %s", self.name, validation_result)
+            return {
+            "success": False,
+            "server_error": False,
+            "error": validation_result
+        }
+
+        logger.info("%s input data validated successfully", self.name)
+        
+        return self._send_one(input_data)
+    
+    def run_batch(self, input_list: List[Any]) -> Dict[str, Any]:
+        """
+        Sends several emails over one SMTP session.
+        All messages are validated before any is sent, so an invalid message sends nothing.
+        
+        Args:
+            input_list (List[Any]): The email details for each message
+            
+        Returns:
+            Dict: Overall result, with the result of each message under "results" in order
+        """
+        if not isinstance(input_list, list):
+            return {
+                "success": False,
+                "server_error": False,
+                "error": f"Input must be a list of dictionaries. Current input type: {type(input_list).__name__}"
+            }
+        
+        if not input_list:
+            return {
+                "success": False,
+                "server_error": False,
+                "error": f"Input list cannot be empty. {_SCHEMA_PROMPT}"
+            }
+        
+        logger.info("%s is running a batch of %s emails", self.name, len(input_list))
+        
+        for index, input_data in enumerate(input_list):
+            validation_result = self.validate_input_schema(input_data)
+            if validation_result['success'] is False:
+                logger.info("%s input data validation failed for email %s: %s", self.name, index, validation_result)
+                return {
+                    "success": False,
+                    "server_error": False,
+                    "error": validation_result,
+                    "index": index
+                }
+        
+        # Hold the connection for the whole batch so other sends do not interleave
+        with self._smtp_lock:
+            results = [self._send_one(input_data) for input_data in input_list]
+        
+        sent_count = sum(1 for result in results if result['success'])
+        batch_result = {
+            "success": sent_count == len(results),
+            "message": f"Sent {sent_count} of {len(results)} emails",
+            "results": results
+        }
+        if 0 < sent_count < len(results):
+            # Regenerating the batch would send the delivered emails again, so do not ask for a retry
+            batch_result["server_error"] = True
+        return batch_result
@@ -1,7 +1,8 @@
-from pydantic import BaseModel, ValidationError, Field
-from typing import Any, Dict, Optional
-import json
+from collections import namedtuple
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional, Union
 import logging
+import orjson
 
 # Configure logger for routes module
 logger = logging.getLogger(__name__)
@@ -16,45 +17,43 @@ class SchemaData(BaseModel):
     data: Dict[str, Any] = Field(default_factory=dict, description="Data field must be a dictionary")
 
 
-def validate_schema(json_data: str) -> tuple[bool, Optional[SchemaData], Optional[str]]:
+# A validated message; has the same type and data attributes as SchemaData, without model overhead
+ValidatedMessage = namedtuple('ValidatedMessage', ['type', 'data'])
+
+
+def validate_schema(json_data: Union[str, bytes]) -> tuple[bool, Optional[ValidatedMessage], Optional[str]]:
     """
     Validate JSON data against the schema.
     
     Args:
-        json_data (str): JSON string to validate
+        json_data (Union[str, bytes]): JSON text to validate; bytes are parsed without decoding first
         
     Returns:
         tuple: (is_valid, validated_data, error_message)
     """
-    logger.debug(f"Validating JSON schema: {json_data}")
+    logger.debug("Validating JSON schema: %s", json_data)
     
     try:
         # Parse JSON string
-        parsed_data = json.loads(json_data)
-        logger.debug(f"JSON parsed successfully: {parsed_data}")
-        
-        # Validate against Pydantic model
-        validated_data = SchemaData(**parsed_data)
-        logger.info(f"Schema validation successful - Type: {validated_data.type}")
+        parsed_data = orjson.loads(json_data)
+        logger.debug("JSON parsed successfully: %s", parsed_data)
         
-        return True, validated_data, None
+        # Validate the message structure
+        return validate_schema_dict(parsed_data)
         
-    except json.JSONDecodeError as e:
-        logger.warning(f"JSON decode error: {str(e)}")
+    except orjson.JSONDecodeError as e:
+        logger.warning("JSON decode error: %s", e)
         return False, None, f"Invalid JSON format: {str(e)}"
         
-    except ValidationError as e:
-        logger.warning(f"Schema validation error: {str(e)}")
-        return False, None, f"Schema validation error: {str(e)}"
-        
     except Exception as e:
-        logger.error(f"Unexpected error during validation: {str(e)}", exc_info=True)
+        logger.error("Unexpected error during validation: %s", e, exc_info=True)
         return False, None, f"Unexpected error: {str(e)}"
 
 
-def validate_schema_dict(data: Dict[str, Any]) -> tuple[bool, Optional[SchemaData], Optional[str]]:
+def validate_schema_dict(data: Dict[str, Any]) -> tuple[bool, Optional[ValidatedMessage], Optional[str]]:
     """
     Validate dictionary data against the schema.
+    Applies the same rules as SchemaData with plain type checks, as this runs for every message.
     
     Args:
         data (Dict[str, Any]): Dictionary to validate
@@ -62,25 +61,26 @@ def validate_schema_dict(data: Dict[str, Any]) -> tuple[bool, Optional[SchemaDat
     Returns:
         tuple: (is_valid, validated_data, error_message)
     """
-    logger.debug(f"Validating dictionary schema: {data}")
+    logger.debug("Validating dictionary schema: %s", data)
     
-    try:
-        # Validate against Pydantic model
-        validated_data = SchemaData(**data)
-        logger.info(f"Dictionary schema validation successful - Type: {validated_data.type}")
-        
-        return True, validated_data, None
-        
-    except ValidationError as e:
-        logger.warning(f"Dictionary schema validation error: {str(e)}")
-        return False, None, f"Schema validation error: {str(e)}"
-        
-    except Exception as e:
-        logger.error(f"Unexpected error during dictionary validation: {str(e)}", exc_info=True)
-        return False, None, f"Unexpected error: {str(e)}"
+    if not isinstance(data, dict):
+        error = f"Message must be a JSON object, got {type(data).__name__}"
+    else:
+        message_type = data.get('type')
+        message_data = data.get('data', {})
+        if not isinstance(message_type, str) or not message_type:
+            error = "Type field must be a non-empty string"
+        elif not isinstance(message_data, dict):
+            error = "Data field must be a dictionary"
+        else:
+            logger.info("Dictionary schema validation successful - Type: %s", message_type)
+            return True, ValidatedMessage(message_type, message_data), None
+    
+    logger.warning("Dictionary schema validation error: %s", error)
+    return False, None, f"Schema validation error: {error}"
 
 
-def validate_websocket_message(message: Dict[str, Any]) -> tuple[bool, Optional[SchemaData], Optional[str]]:
+def validate_websocket_message(message: Dict[str, Any]) -> tuple[bool, Optional[ValidatedMessage], Optional[str]]:
     """
     Validate WebSocket message against the schema.
     This is a convenience function for WebSocket message validation.
@@ -91,7 +91,7 @@ def validate_websocket_message(message: Dict[str, Any]) -> tuple[bool, Optional[
     Returns:
         tuple: (is_valid, validated_data, error_message)
     """
-    logger.debug(f"Validating WebSocket message: {message}")
+    logger.debug("Validating WebSocket message: %s", message)
     return validate_schema_dict(message)
 
 